@@ -0,0 +1,116 @@
+"""
+Compares the bulk parsers behind get_dataset with the original line-by-line loaders.
+
+For every (dataset, n) pair the script times the frozen legacy loader (legacy_loaders.py) and the
+current get_dataset on the same files, checks that all returned arrays are bit-identical (values,
+shape and dtype) and prints the speedup. The "parse" rows time only the file decoding step of the
+KL polynomial and mHeight loaders, where the line-by-line tokenizing dominated.
+
+Usage:
+    python benchmarks/bench_parsers.py --rows 1000000 --datasets kl_polynomial:7 mheight:12
+    python benchmarks/bench_parsers.py --folder /path/to/data --datasets kl_polynomial:7
+
+Without --folder, synthetic files with --rows training rows are written to a temporary directory.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fixtures
+import legacy_loaders
+import load_datasets
+import parsers
+
+DEFAULT_DATASETS = [
+    "weaving:7", "rsk:9", "schubert:5", "symmetric_group_char:20", "quiver:11", "mheight:12",
+    "grassmannian_cluster_algebras:12", "kl_polynomial:7", "lattice_path:12",
+]
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _check_identical(name, expected, actual):
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        a, b = np.asarray(a), np.asarray(b)
+        if a.shape != b.shape or a.dtype != b.dtype or not np.array_equal(a, b):
+            raise AssertionError(f"{name}: output {i} differs ({a.shape} {a.dtype} vs {b.shape} {b.dtype})")
+
+
+def _legacy_kl_parse(folder, n):
+    return legacy_loaders.load_kl_polynomial_data(os.path.join(folder, "kl-polynomials/"), n)
+
+
+def _bulk_kl_parse(folder, n):
+    return load_datasets.load_kl_polynomial_data(os.path.join(folder, "kl-polynomials/"), n)
+
+
+def _legacy_mheight_parse(folder, n):
+    table = np.loadtxt(os.path.join(folder, f"mheight_function/mHeight_{n}_train.txt"), dtype=str, delimiter=";")
+    return legacy_loaders.parse_mheight_data(table)
+
+
+def _bulk_mheight_parse(folder, n):
+    return parsers.parse_mheight(os.path.join(folder, f"mheight_function/mHeight_{n}_train.txt"))
+
+
+def _check_parse(data, legacy, bulk):
+    if data == "kl_polynomial":
+        for old_split, (X, coeffs, offsets) in zip(legacy, bulk):
+            _check_identical("kl parse", [np.array([d[0] + d[1] for d in old_split])], [X])
+            _check_identical("kl parse", [np.concatenate([d[2] for d in old_split])], [coeffs])
+            _check_identical("kl parse", [np.array([len(d[2]) for d in old_split])], [np.diff(offsets)])
+    else:
+        _check_identical("mheight parse", [np.array(legacy[0]), np.array(legacy[1])], bulk)
+
+
+PARSE_STEPS = {
+    "kl_polynomial": (_legacy_kl_parse, _bulk_kl_parse),
+    "mheight": (_legacy_mheight_parse, _bulk_mheight_parse),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", nargs="+", default=DEFAULT_DATASETS, help="dataset:n pairs to run")
+    parser.add_argument("--rows", type=int, default=100000, help="training rows per synthetic file")
+    parser.add_argument("--folder", default=None, help="use the real data in this folder instead of synthetic files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'dataset':<32}{'n':>4}{'step':>8}{'legacy (s)':>13}{'bulk (s)':>11}{'speedup':>10}")
+        for spec in args.datasets:
+            data, n = spec.split(":")
+            n = int(n)
+            folder = args.folder
+            if folder is None:
+                folder = fixtures.write_fixture(data, n, os.path.join(tmp, f"{data}_{n}"), rows=args.rows)
+
+            steps = [("load", legacy_loaders.get_dataset, load_datasets.get_dataset)]
+            if data in PARSE_STEPS:
+                steps.insert(0, ("parse", *PARSE_STEPS[data]))
+            for step, legacy_fn, bulk_fn in steps:
+                expected, legacy_time = _timed(legacy_fn, data, n, folder) if step == "load" else _timed(legacy_fn, folder, n)
+                actual, bulk_time = _timed(bulk_fn, data, n, folder) if step == "load" else _timed(bulk_fn, folder, n)
+                if step == "load":
+                    _check_identical(f"{data} n={n}", expected, actual)
+                else:
+                    _check_parse(data, expected, actual)
+                print(f"{data:<32}{n:>4}{step:>8}{legacy_time:>13.3f}{bulk_time:>11.3f}{legacy_time / bulk_time:>9.1f}x")
+        print("All outputs are bit-identical to the legacy loaders.")
+
+
+if __name__ == "__main__":
+    main()
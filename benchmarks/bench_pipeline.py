@@ -0,0 +1,197 @@
+"""
+Measures the cost of loading every dataset and feeding it to the DataModules.
+
+Every (dataset, n) pair runs in a fresh process, so that peak RSS belongs to that pair alone. For each pair
+the script records:
+    - get_dataset: wall time, the per-phase timings of LoadedDataset, peak RSS and the bytes read
+      through read() calls (/proc/self/io, Linux only)
+    - CombDataModule and OneHotDataModule: setup time, time to the first batch and training
+      DataLoader samples/sec over --batches batches
+and writes the results as JSON. --compare prints the speedup of each measurement over an earlier run
+(above 1 is faster).
+
+Usage:
+    python benchmarks/bench_pipeline.py --rows 20000 --output results.json
+    python benchmarks/bench_pipeline.py --datasets weaving:7 rsk:9 --compare results.json
+    python benchmarks/bench_pipeline.py --folder /path/to/data --datasets mheight:12
+
+Without --folder, synthetic files with --rows training rows are written to a temporary directory.
+Without --datasets, every supported (dataset, n) pair of the load_datasets registry is run. With --folder,
+pairs whose files are missing from the folder are skipped and listed under "skipped" in the JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fixtures
+import load_datasets
+
+
+def _all_pairs():
+    return [f"{name}:{n}" for name, spec in load_datasets.DATASETS.items()
+            for n in (sorted(spec.sizes) if spec.sizes is not None else [None])]
+
+
+def _parse_pair(pair):
+    data, n = pair.split(":")
+    return data, None if n in ("", "None") else int(n)
+
+
+def _missing_files(data, n, folder):
+    return [f for f in load_datasets.dataset_files(data, n, folder) if not os.path.exists(f)]
+
+
+def _peak_rss():
+    """Peak resident set size of this process so far, in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _bytes_read():
+    """Bytes this process has read through read() calls so far, or None where /proc/self/io is missing."""
+    try:
+        with open("/proc/self/io") as f:
+            return int(next(line for line in f if line.startswith("rchar:")).split()[1])
+    except (OSError, StopIteration):
+        return None
+
+
+def _bench_module(module, batches):
+    start = time.perf_counter()
+    module.setup()
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    samples, first_batch = 0, None
+    for i, (X, _) in enumerate(module.train_dataloader()):
+        if first_batch is None:
+            first_batch = time.perf_counter() - start
+        samples += len(X)
+        if i + 1 == batches:
+            break
+    elapsed = time.perf_counter() - start
+    return {"setup_s": setup, "first_batch_s": first_batch, "batches": i + 1, "samples": samples,
+            "samples_per_s": samples / elapsed if elapsed else None}
+
+
+def _run_pair(data, n, folder, options):
+    """Runs one (dataset, n) pair. Meant to be called in a fresh process."""
+    from dataloaders import CombDataModule, OneHotDataModule
+
+    result = {"data": data, "n": n, "input_bytes": sum(os.path.getsize(f) for f in load_datasets.dataset_files(data, n, folder))}
+    rss_before = _peak_rss()
+    read_before = _bytes_read()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        dataset = load_datasets.get_dataset(data, n, folder, num_workers=options["num_workers"],
+                                            compact=options["compact"], packed=options["packed"], verbose=False)
+    read_after = _bytes_read()
+    result["load"] = {
+        "wall_s": time.perf_counter() - start,
+        "phases_s": dataset.timings,
+        "peak_rss_bytes": _peak_rss(),
+        "rss_growth_bytes": _peak_rss() - rss_before,
+        "bytes_read": None if read_before is None else read_after - read_before,
+    }
+    result["rows"] = {"train": len(dataset.X_train), "test": len(dataset.X_test)}
+    # PackedBits.nbytes is the packed size, so --packed runs report what is actually held in memory
+    result["array_bytes"] = int(sum(a.nbytes for a in dataset.as_tuple()[:4]))
+
+    splits = dataset.as_tuple()[:4]
+    loader = dict(batch_size=options["batch_size"], batch_sampler=options["batch_sampler"], num_workers=options["loader_workers"],
+                  pin_memory=options["pin_memory"], persistent_workers=options["loader_workers"] > 0)
+    result["comb"] = _bench_module(CombDataModule(*splits, **loader), options["batches"])
+    result["one_hot"] = _bench_module(OneHotDataModule(*splits, int(dataset.num_tokens), **loader), options["batches"])
+    result["peak_rss_bytes"] = _peak_rss()
+    return result
+
+
+def _isolated(data, n, folder, options):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(_run_pair, data, n, folder, options).result()
+
+
+def _environment():
+    import numpy as np
+    import torch
+    return {"python": platform.python_version(), "numpy": np.__version__, "torch": torch.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def _print_row(result, baseline=None):
+    load, comb, one_hot = result["load"], result["comb"], result["one_hot"]
+    row = (f"{result['data']:<32}{str(result['n']):>5}{load['wall_s']:>10.3f}{load['rss_growth_bytes'] / 2**20:>10.1f}"
+           f"{comb['samples_per_s']:>13.0f}{one_hot['samples_per_s']:>13.0f}")
+    if baseline is not None:
+        row += (f"{baseline['load']['wall_s'] / load['wall_s']:>10.2f}x"
+                f"{comb['samples_per_s'] / baseline['comb']['samples_per_s']:>9.2f}x"
+                f"{one_hot['samples_per_s'] / baseline['one_hot']['samples_per_s']:>9.2f}x")
+    print(row, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", nargs="+", default=None, help="dataset:n pairs to run (default: all supported pairs)")
+    parser.add_argument("--rows", type=int, default=20000, help="training rows per synthetic file")
+    parser.add_argument("--folder", default=None, help="use the real data in this folder instead of synthetic files")
+    parser.add_argument("--batch-size", type=int, default=256, help="DataLoader batch size")
+    parser.add_argument("--batches", type=int, default=200, help="number of training batches timed per DataModule")
+    parser.add_argument("--num-workers", type=int, default=1, help="num_workers passed to get_dataset")
+    parser.add_argument("--loader-workers", type=int, default=0, help="DataLoader worker processes of the DataModules")
+    parser.add_argument("--pin-memory", action="store_true", help="pin DataLoader batches in page-locked memory")
+    parser.add_argument("--per-row", action="store_true", help="fetch and collate rows one at a time (batch_sampler=False)")
+    parser.add_argument("--compact", action="store_true", help="load with get_dataset(..., compact=True)")
+    parser.add_argument("--packed", action="store_true", help="load with get_dataset(..., packed=True)")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    options = {"batch_size": args.batch_size, "batches": args.batches, "num_workers": args.num_workers,
+               "compact": args.compact, "packed": args.packed, "batch_sampler": not args.per_row,
+               "loader_workers": args.loader_workers, "pin_memory": args.pin_memory}
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = {(r["data"], r["n"]): r for r in json.load(f)["results"]}
+
+    results, skipped = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        header = f"{'dataset':<32}{'n':>5}{'load (s)':>10}{'+RSS (MB)':>10}{'comb (/s)':>13}{'one-hot (/s)':>13}"
+        if baseline:
+            header += f"{'load':>11}{'comb':>10}{'one-hot':>10}"
+        print(header, flush=True)
+        for pair in args.datasets or _all_pairs():
+            data, n = _parse_pair(pair)
+            folder = args.folder
+            if folder is None:
+                folder = fixtures.write_fixture(data, n, os.path.join(tmp, f"{data}_{n}"), rows=args.rows)
+            else:
+                # A real data folder usually holds only some of the registry's (dataset, n) pairs
+                missing = _missing_files(data, n, folder)
+                if missing:
+                    skipped.append({"data": data, "n": n, "missing_files": missing})
+                    print(f"{data:<32}{str(n):>5}  skipped, missing {os.path.basename(missing[0])}", flush=True)
+                    continue
+            result = _isolated(data, n, folder, options)
+            results.append(result)
+            _print_row(result, baseline.get((data, n)))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"environment": _environment(), "options": dict(options, rows=args.rows, folder=args.folder),
+                       "results": results, "skipped": skipped}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
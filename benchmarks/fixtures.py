@@ -0,0 +1,141 @@
+"""
+Synthetic dataset files in the exact text layouts that load_datasets.get_dataset reads.
+
+The values are random but respect the shape of each format (permutations, partitions,
+tableaux, binary paths, ...), so the files exercise the same parsing and padding code
+as the real data without needing it on disk.
+"""
+import os
+
+import numpy as np
+
+from load_datasets import QUIVER_FILES
+
+
+def _permutation(rng, n):
+    return [int(i) + 1 for i in rng.permutation(n)]
+
+
+def _partition(rng, n):
+    parts = []
+    remaining = n
+    while remaining > 0:
+        part = int(rng.integers(1, remaining + 1))
+        parts.append(part)
+        remaining -= part
+    return sorted(parts, reverse=True)
+
+
+def _tableau(rng, n):
+    shape = _partition(rng, n)
+    entries = iter(range(1, n + 1))
+    return [[next(entries) for _ in range(row)] for row in shape]
+
+
+def _write(path, lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+def write_weaving(folder, n, rows, rng):
+    for split, count in (("train", rows), ("test", max(1, rows // 4))):
+        # Row i of a pattern is a permutation of {1..n} without i+1, as in WeavingPattern.to_lines
+        X = [",".join(str(v) for i in range(n) for v in rng.permutation([j + 1 for j in range(n) if j != i])) + "\n"
+             for _ in range(count)]
+        y = [f"{int(rng.integers(0, 2))}\n" for _ in range(count)]
+        _write(os.path.join(folder, f"weaving_patterns/weaving_pattern_{split}_{n}.txt"), X)
+        _write(os.path.join(folder, f"weaving_patterns/labels_{split}_{n}.txt"), y)
+
+
+def write_rsk(folder, n, rows, rng):
+    for split, count in (("train", rows), ("test", max(1, rows // 4))):
+        X = [f"[{_tableau(rng, n)}, {_tableau(rng, n)}]\n" for _ in range(count)]
+        y = [f"{_permutation(rng, n)}\n" for _ in range(count)]
+        _write(os.path.join(folder, f"robinson-schensted/output_tableau_pairs_{n}_{split}.txt"), X)
+        _write(os.path.join(folder, f"robinson-schensted/input_permutations_{n}_{split}.txt"), y)
+
+
+def write_schubert(folder, n, rows, rng):
+    for split, count in (("train", rows), ("test", max(1, rows // 4))):
+        lines = []
+        for _ in range(count):
+            gamma = _permutation(rng, int(rng.integers(n, 2 * n)))
+            lines.append(f"[{_permutation(rng, n)}, {_permutation(rng, n)}, {gamma}, {int(rng.integers(0, 4))}]\n")
+        _write(os.path.join(folder, f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_{split}.txt"), lines)
+
+
+def write_symmetric_group_char(folder, n, rows, rng):
+    for split, count in (("train", rows), ("test", max(1, rows // 4))):
+        lines = [f"({_partition(rng, n)}, {_partition(rng, n)}, {int(rng.integers(-10**6, 10**6))})\n" for _ in range(count)]
+        _write(os.path.join(folder, f"symmetric_group_char/sym_grp_char_{n}_{split}.txt"), lines)
+
+
+def write_quiver(folder, n, rows, rng):
+    size = 11
+    for name in QUIVER_FILES:
+        lines = []
+        for _ in range(max(1, rows // len(QUIVER_FILES))):
+            upper = np.triu(rng.integers(-2, 3, size=(size, size)), 1)
+            lines.append(",".join(str(int(v)) for v in (upper - upper.T).flatten()) + "\n")
+        _write(os.path.join(folder, f"cluster_algebra_quivers/{name}"), lines)
+
+
+def write_mheight(folder, n, rows, rng):
+    for split, count in (("train", rows), ("test", max(1, rows // 4))):
+        lines = []
+        for _ in range(count):
+            bits = rng.integers(0, 2, size=n * (n - 1) // 2)
+            lines.append("(" + ", ".join(str(int(b)) for b in bits) + f");{int(rng.integers(0, 5))}\n")
+        _write(os.path.join(folder, f"mheight_function/mHeight_{n}_{split}.txt"), lines)
+
+
+def write_grassmannian_cluster_algebras(folder, n, rows, rng):
+    for kind in ("valid", "invalid"):
+        for split, count in (("train", rows // 2), ("test", max(1, rows // 8))):
+            lines = []
+            for _ in range(count):
+                entries = np.sort(rng.integers(1, 13, size=12)).reshape(4, 3).T
+                lines.append("".join(str([int(v) for v in row]) for row in entries) + "\n")
+            _write(os.path.join(folder, f"grassmannian_cluster_algebras/3_4_12_{kind}_{split}.txt"), lines)
+
+
+def write_kl_polynomial(folder, n, rows, rng):
+    for split, count in (("train", rows), ("test", max(1, rows // 4))):
+        lines = []
+        for _ in range(count):
+            coeffs = [1] + [int(c) for c in rng.integers(0, 30, size=int(rng.integers(0, 5)))]
+            perms = "".join(str(v) for v in _permutation(rng, n)) + ", " + "".join(str(v) for v in _permutation(rng, n))
+            lines.append(perms + ", " + ", ".join(str(c) for c in coeffs) + "\n")
+        _write(os.path.join(folder, f"kl-polynomials/kl_polynomials_{n}_{split}.txt"), lines)
+
+
+def write_lattice_path(folder, n, rows, rng):
+    for order in ("lagrange", "matching"):
+        for split, count in (("train", rows // 2), ("test", max(1, rows // 8))):
+            lines = []
+            for _ in range(count):
+                paths = ["".join(str(int(b)) for b in rng.integers(0, 2, size=2 * n - 1)) for _ in range(2)]
+                lines.append(f"'{paths[0]}', '{paths[1]}'\n")
+            _write(os.path.join(folder, f"lattice_paths/{order}_covers_{split}_{n}_{n-1}.csv"), lines)
+
+
+WRITERS = {
+    "weaving": write_weaving,
+    "rsk": write_rsk,
+    "schubert": write_schubert,
+    "symmetric_group_char": write_symmetric_group_char,
+    "quiver": write_quiver,
+    "mheight": write_mheight,
+    "grassmannian_cluster_algebras": write_grassmannian_cluster_algebras,
+    "kl_polynomial": write_kl_polynomial,
+    "lattice_path": write_lattice_path,
+}
+
+
+def write_fixture(data, n, folder, rows=1000, seed=0):
+    """
+    Writes synthetic train/test files for (data, n) under folder, with roughly `rows` training rows.
+    """
+    WRITERS[data](folder, n, rows, np.random.default_rng(seed))
+    return folder
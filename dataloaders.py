@@ -1,52 +1,543 @@
+import numpy as np
 import torch
 import lightning.pytorch as pl
 from lightning.pytorch import LightningModule, LightningDataModule
 from lightning.pytorch.loggers import TensorBoardLogger
-from torch.utils.data import DataLoader, TensorDataset
-import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset, IterableDataset, Sampler, TensorDataset, get_worker_info
 
+from load_datasets import PackedBits, iter_dataset, stream_index, stream_layout
 
-class CombDataModule(LightningDataModule):
-    def __init__(self, X_train, y_train, X_test, y_test, batch_size=32):
+
+def _reopen_memmap(array):
+    """Returns the path of the .npy file behind a whole-file memmap, or None for anything else."""
+    filename = getattr(array, "filename", None)
+    if not isinstance(array, np.memmap) or filename is None:
+        return None
+    header = np.load(filename, mmap_mode="r")
+    return filename if header.shape == array.shape and header.dtype == array.dtype else None
+
+
+def _is_memmap(array):
+    """True for an np.memmap and for a PackedBits over one, as returned by get_dataset(..., mmap=True)."""
+    return isinstance(array.packed if isinstance(array, PackedBits) else array, np.memmap)
+
+
+class MemmapDataset(Dataset):
+    """
+    Dataset over NumPy arrays, typically the np.memmap arrays returned by get_dataset(..., mmap=True).
+    Rows are converted to tensors only when they are fetched, so the full split is never copied into
+    process memory; a PackedBits array is unpacked for the fetched rows only. Pickling (e.g. for spawned
+    DataLoader workers) reopens the memmap by file name. Indexing with a slice or an index tensor (see
+    BlockSampler) returns a whole batch. X is cast to x_dtype (None keeps the stored dtype) and y to long.
+    """
+    def __init__(self, X, y, x_dtype=torch.float32):
+        self.X = X
+        self.y = y
+        self.x_dtype = x_dtype
+
+    def __len__(self):
+        return len(self.X)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, torch.Tensor):
+            # Reading the rows in file order keeps random batches close to sequential reads
+            idx = np.sort(idx.numpy()) if idx.ndim else idx.item()
+        X = torch.from_numpy(np.array(self.X[idx]))
+        return (X if self.x_dtype is None else X.to(self.x_dtype)), torch.from_numpy(np.array(self.y[idx])).long()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for name in ("X", "y"):
+            array = state[name]
+            if isinstance(array, PackedBits):
+                filename = _reopen_memmap(array.packed)
+                if filename is not None:
+                    state[name] = ("packed", filename, array.width)
+                continue
+            filename = _reopen_memmap(array)
+            if filename is not None:
+                state[name] = ("memmap", filename)
+        return state
+
+    def __setstate__(self, state):
+        for name in ("X", "y"):
+            if isinstance(state[name], tuple) and state[name][0] == "memmap":
+                state[name] = np.load(state[name][1], mmap_mode="r")
+            elif isinstance(state[name], tuple) and state[name][0] == "packed":
+                state[name] = PackedBits(np.load(state[name][1], mmap_mode="r"), state[name][2])
+        self.__dict__.update(state)
+
+
+class StreamingDataset(IterableDataset):
+    """
+    Streams one split of a dataset from disk in batches, via load_datasets.iter_dataset, so files that do not
+    fit in memory can still be trained on. Each DataLoader worker parses only its own share of the file chunks.
+    The dataset yields whole batches, so use it with DataLoader(dataset, batch_size=None, num_workers=...).
+
+    With shuffle=True the chunks of all files of the split are read in a random order, which interleaves the
+    files (and so the classes of datasets stored one file per class), and rows pass through a shuffle buffer
+    of buffer_chunks chunks (and at least one batch). Every pass over the dataset advances the epoch, so
+    consecutive epochs differ; set_epoch sets it explicitly. In fresh (non-persistent) DataLoader workers the
+    DataLoader's base seed of the pass is mixed in as well, since their copy of the epoch counter does not
+    carry over between passes.
+    """
+    def __init__(self, data, n=None, split="train", folder="./", batch_size=32, chunk_size=65536, shuffle=False, seed=0,
+                 buffer_chunks=4):
+        super().__init__()
+        self.data = data
+        self.n = n
+        self.split = split
+        self.folder = folder
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.buffer_chunks = buffer_chunks
+        self.epoch = 0
+        # Dataset-wide padding/rescaling values and chunk offsets, computed once here instead of in every worker
+        self.layout = stream_layout(data, n, folder)
+        self.index = stream_index(data, n, split, chunk_size, folder) if shuffle else None
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _batches(self, X, y):
+        X, y = torch.from_numpy(X).float(), torch.from_numpy(y).long()
+        for start in range(0, len(X), self.batch_size):
+            yield X[start:start + self.batch_size], y[start:start + self.batch_size]
+
+    def __iter__(self):
+        worker = get_worker_info()
+        num_shards, shard = (1, 0) if worker is None else (worker.num_workers, worker.id)
+        epoch = self.epoch
+        self.epoch += 1
+        if not self.shuffle:
+            for X, y in iter_dataset(self.data, self.n, self.split, self.chunk_size, self.folder, self.layout, num_shards, shard):
+                yield from self._batches(X, y)
+            return
+
+        # Every shard draws the same chunk order and reads its own part of it
+        seed = (self.seed, epoch) if worker is None else (self.seed, epoch, worker.seed - worker.id)
+        chunks = iter_dataset(self.data, self.n, self.split, self.chunk_size, self.folder, self.layout, num_shards, shard,
+                              seed=seed, index=self.index)
+        rng = np.random.default_rng((*seed, shard))
+        # Sliding shuffle buffer: once it holds capacity rows, every new chunk lets whole batches out of the
+        # shuffled buffer until it is back down to capacity rows
+        capacity = max(self.buffer_chunks * self.chunk_size, self.batch_size)
+        X_pool = y_pool = None
+        for X, y in chunks:
+            X_pool = X if X_pool is None else np.concatenate([X_pool, X])
+            y_pool = y if y_pool is None else np.concatenate([y_pool, y])
+            if len(X_pool) < capacity:
+                continue
+            order = rng.permutation(len(X_pool))
+            X_pool, y_pool = X_pool[order], y_pool[order]
+            out = max((len(X_pool) - capacity) // self.batch_size, 1) * self.batch_size
+            yield from self._batches(X_pool[:out], y_pool[:out])
+            X_pool, y_pool = X_pool[out:], y_pool[out:]
+        if X_pool is not None:
+            order = rng.permutation(len(X_pool))
+            yield from self._batches(X_pool[order], y_pool[order])
+
+
+class BlockSampler(Sampler):
+    """
+    Sampler that yields the rows of a whole batch at once, for use with DataLoader(dataset, sampler=...,
+    batch_size=None) over a dataset that gathers a batch in one __getitem__ call (TensorDataset, MemmapDataset).
+    Without shuffling every batch is a contiguous slice, which a TensorDataset returns as a view. With
+    shuffling every batch is a block of a permutation drawn anew each epoch, from generator if given and
+    otherwise from the global torch seed, like shuffle=True in a DataLoader.
+    """
+    def __init__(self, num_rows, batch_size, shuffle=False, drop_last=False, generator=None):
+        self.num_rows = num_rows
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __len__(self):
+        if self.drop_last:
+            return self.num_rows // self.batch_size
+        return (self.num_rows + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        stop = len(self) * self.batch_size if self.drop_last else self.num_rows
+        if not self.shuffle:
+            for start in range(0, stop, self.batch_size):
+                yield slice(start, min(start + self.batch_size, stop))
+            return
+        generator = self.generator
+        if generator is None:
+            generator = torch.Generator()
+            generator.manual_seed(int(torch.empty((), dtype=torch.int64).random_().item()))
+        order = torch.randperm(self.num_rows, generator=generator)
+        for start in range(0, stop, self.batch_size):
+            yield order[start:start + self.batch_size]
+
+
+def class_index(y):
+    """
+    Groups the rows of a label array by class, for ClassSampler. Rows of a 2D y (or a PackedBits) are grouped
+    by their whole label row. Returns (classes, order, offsets) in the ragged layout of parsers: the rows of
+    class classes[c] are order[offsets[c]:offsets[c+1]], in increasing order. classes holds the label values,
+    as tuples for 2D labels.
+    """
+    labels = np.asarray(y.packed if isinstance(y, PackedBits) else y)
+    rows = labels.reshape(len(labels), -1)
+    codes = _class_codes(rows)
+    if codes is None:
+        codes = np.unique(rows, axis=0, return_inverse=True)[1].reshape(-1)
+    counts = np.bincount(codes)
+    # Renumber the classes that occur as 0, 1, ... in a dtype small enough for a radix sort
+    present = np.flatnonzero(counts)
+    renumber = np.zeros(len(counts), dtype=np.min_scalar_type(max(len(present) - 1, 0)))
+    renumber[present] = np.arange(len(present))
+    order = np.argsort(renumber[codes], kind="stable")
+    offsets = np.zeros(len(present) + 1, dtype=np.int64)
+    np.cumsum(counts[present], out=offsets[1:])
+
+    first = labels[order[offsets[:-1]]]
+    if isinstance(y, PackedBits):
+        first = PackedBits(first, y.width).unpack()
+    classes = first.tolist() if first.ndim == 1 else [tuple(row) for row in first.tolist()]
+    return classes, order, offsets
+
+
+def _class_codes(rows):
+    """
+    Numbers the distinct rows of an integer (N, k) array as mixed-radix integers, in lexicographic order.
+    Returns None for other dtypes, or when the numbers would not stay small enough for np.bincount.
+    """
+    if rows.dtype.kind not in "iub" or len(rows) == 0:
+        return None
+    low = rows.min(axis=0).astype(np.int64)
+    spans = rows.max(axis=0).astype(np.int64) - low + 1
+    if np.prod(spans.astype(float)) > max(4 * len(rows), 1 << 20):
+        return None
+    codes = np.zeros(len(rows), dtype=np.int64)
+    for column, l, span in zip(rows.T, low, spans):
+        codes *= span
+        codes += column
+        codes -= l
+    return codes
+
+
+class ClassSampler(Sampler):
+    """
+    Class-aware replacement for shuffle=True on skewed classification splits. The per-class index
+    (see class_index) is built once, and every epoch is drawn from it without a pass over the majority class.
+    mode is one of
+        - "weighted": num_samples rows drawn with replacement, picking class c with probability proportional to
+          class_weights[c] (equal weights by default) and a row of that class uniformly.
+        - "stratified": num_samples rows split between the classes in the proportions of class_weights (equal
+          by default), spread evenly over the batches. Each class is gone through in a fresh random order
+          before any of its rows repeats.
+        - "subsample": every class capped at max_per_class rows (by default the size of the second largest
+          class), with a new random subset of the larger classes every epoch.
+    num_samples defaults to the number of rows, and a class with weight 0 is left out. Yields index blocks of
+    batch_size rows like BlockSampler. Epoch k is drawn from the seed (seed, k), where k counts the epochs
+    iterated so far unless set with set_epoch (as Lightning does), so runs are reproducible.
+    """
+    def __init__(self, y, batch_size, mode="weighted", class_weights=None, num_samples=None, max_per_class=None, seed=0):
+        if mode not in ("weighted", "stratified", "subsample"):
+            raise ValueError(f'mode must be "weighted", "stratified" or "subsample", not {mode!r}.')
+        self.classes, self.order, self.offsets = class_index(y)
+        self.counts = np.diff(self.offsets)
+        self.batch_size = batch_size
+        self.mode = mode
+        self.num_samples = len(self.order) if num_samples is None else num_samples
+        if max_per_class is None:
+            max_per_class = np.sort(self.counts)[-2] if len(self.counts) > 1 else len(self.order)
+        self.max_per_class = int(max_per_class)
+        weights = np.ones(len(self.classes))
+        if class_weights is not None:
+            weights = np.array([class_weights.get(c, 0.0) for c in self.classes], dtype=float)
+        if not weights.sum() > 0:
+            raise ValueError("class_weights gives no class of the labels a positive weight.")
+        self.weights = weights / weights.sum()
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _epoch_size(self):
+        if self.mode == "subsample":
+            return int(np.minimum(self.counts, self.max_per_class).sum())
+        return self.num_samples
+
+    def __len__(self):
+        return (self._epoch_size() + self.batch_size - 1) // self.batch_size
+
+    def _weighted(self, rng):
+        classes = rng.choice(len(self.counts), size=self.num_samples, p=self.weights)
+        picks = self.offsets[classes] + (rng.random(self.num_samples) * self.counts[classes]).astype(np.int64)
+        return self.order[picks]
+
+    def _stratified(self, rng):
+        # Largest-remainder split of num_samples between the classes
+        shares = self.weights * self.num_samples
+        draws = np.floor(shares).astype(np.int64)
+        draws[np.argsort(draws - shares, kind="stable")[:self.num_samples - draws.sum()]] += 1
+        rows, positions = [], []
+        for c in np.flatnonzero(draws):
+            members = self.order[self.offsets[c]:self.offsets[c + 1]]
+            cycles = -(-draws[c] // len(members))
+            rows.append(rng.permuted(np.tile(members, (cycles, 1)), axis=1).reshape(-1)[:draws[c]])
+            # Evenly spaced positions with a random phase interleave the classes over the epoch
+            positions.append((np.arange(draws[c]) + rng.random()) / draws[c])
+        return np.concatenate(rows)[np.argsort(np.concatenate(positions), kind="stable")]
+
+    def _subsample(self, rng):
+        # Classes under the cap are kept whole; only the larger ones need a random subset
+        small = self.counts <= self.max_per_class
+        rows = [self.order[np.repeat(small, self.counts)]]
+        for c in np.flatnonzero(~small):
+            rows.append(rng.choice(self.order[self.offsets[c]:self.offsets[c + 1]], self.max_per_class, replace=False))
+        return rng.permutation(np.concatenate(rows))
+
+    def __iter__(self):
+        rng = np.random.default_rng((self.seed, self.epoch))
+        self.epoch += 1
+        rows = torch.from_numpy(getattr(self, f"_{self.mode}")(rng))
+        for start in range(0, len(rows), self.batch_size):
+            yield rows[start:start + self.batch_size]
+
+
+class _LoaderMixin:
+    """
+    DataLoader construction shared by the DataModules. With batch_sampler=True batches are gathered from the
+    backing tensors by BlockSampler and the collate_fn only casts them; with batch_sampler=False every row is
+    fetched and stacked on its own. The worker, pinning and prefetch settings are passed to every DataLoader.
+    When a sampling mode is set, the training DataLoader draws its batches from a ClassSampler over y_train.
+    """
+    def _loader_settings(self, batch_sampler, num_workers, pin_memory, persistent_workers, prefetch_factor):
+        self.batch_sampler = batch_sampler
+        self.num_workers = num_workers
+        self.pin_memory = pin_memory
+        self.persistent_workers = persistent_workers
+        self.prefetch_factor = prefetch_factor
+
+    def _sampling_settings(self, sampling, class_weights, num_samples, max_per_class, seed):
+        self.sampling = sampling
+        self.class_weights = class_weights
+        self.num_samples = num_samples
+        self.max_per_class = max_per_class
+        self.seed = seed
+        self.class_sampler = None
+
+    def _train_sampler(self):
+        # The per-class index is built on first use and kept, so it is computed once per DataModule
+        if self.class_sampler is None:
+            self.class_sampler = ClassSampler(self.y_train, self.batch_size, self.sampling, self.class_weights,
+                                              self.num_samples, self.max_per_class, self.seed)
+        return self.class_sampler
+
+    def _dataloader(self, dataset, shuffle):
+        collate_fn = self._collate_fn()
+        settings = dict(num_workers=self.num_workers, pin_memory=self.pin_memory)
+        # DataLoader rejects these without worker processes
+        if self.num_workers > 0:
+            settings.update(persistent_workers=self.persistent_workers, prefetch_factor=self.prefetch_factor)
+        if shuffle and self.sampling is not None:
+            if not self.batch_sampler:
+                return DataLoader(dataset, batch_sampler=self._train_sampler(), collate_fn=collate_fn, **settings)
+            return DataLoader(dataset, sampler=self._train_sampler(), batch_size=None, collate_fn=collate_fn, **settings)
+        if not self.batch_sampler:
+            return DataLoader(dataset, batch_size=self.batch_size, shuffle=shuffle, collate_fn=collate_fn, **settings)
+        sampler = BlockSampler(len(dataset), self.batch_size, shuffle=shuffle)
+        return DataLoader(dataset, sampler=sampler, batch_size=None, collate_fn=collate_fn, **settings)
+
+
+def _compact_tensor(array, dtype):
+    """
+    Wraps an array as a tensor, keeping its dtype when it is no wider than dtype (the cast then happens per
+    batch) and converting it to dtype otherwise. A PackedBits array is kept packed.
+    """
+    if isinstance(array, PackedBits):
+        array = array.packed
+    if isinstance(array, np.memmap):
+        array = np.array(array)
+    tensor = torch.from_numpy(np.asarray(array))
+    if tensor.element_size() <= torch.empty(0, dtype=dtype).element_size():
+        return tensor
+    return tensor.to(dtype)
+
+
+def _bit_width(array):
+    return array.width if isinstance(array, PackedBits) else None
+
+
+def unpack_bits_batch(packed, width):
+    """Unpacks a (batch, ceil(width/8)) uint8 tensor written by np.packbits into a (batch, width) uint8 tensor."""
+    shifts = torch.arange(7, -1, -1, dtype=torch.uint8, device=packed.device)
+    bits = (packed.unsqueeze(-1) >> shifts) & 1
+    return bits.flatten(-2)[..., :width]
+
+
+class CastCollate:
+    """
+    collate_fn that stacks (X, y) items and casts the batch to x_dtype and y_dtype, so the dataset can hold
+    compact integer dtypes. x_dtype=None leaves X as stored. When x_width or y_width is given, that side is
+    stored as packed bits (see load_datasets.PackedBits) and is unpacked first. With batched=True the
+    items are already a stacked (X, y) batch, as returned for a BlockSampler index block.
+    """
+    def __init__(self, x_dtype=torch.float32, y_dtype=torch.long, x_width=None, y_width=None, batched=False):
+        self.x_dtype = x_dtype
+        self.y_dtype = y_dtype
+        self.x_width = x_width
+        self.y_width = y_width
+        self.batched = batched
+
+    def _stack(self, batch):
+        if self.batched:
+            X, y = batch
+        else:
+            X = torch.stack([x for x, _ in batch])
+            y = torch.stack([y for _, y in batch])
+        if self.x_width is not None:
+            X = unpack_bits_batch(X, self.x_width)
+        if self.y_width is not None:
+            y = unpack_bits_batch(y, self.y_width)
+        return X, y
+
+    def __call__(self, batch):
+        X, y = self._stack(batch)
+        return (X if self.x_dtype is None else X.to(self.x_dtype)), y.to(self.y_dtype)
+
+
+class CombDataModule(_LoaderMixin, LightningDataModule):
+    """
+    Serves the arrays returned by get_dataset as float inputs and long targets.
+
+    With batch_sampler=True (default) each batch is sliced from the stored tensors in one indexing call
+    (see BlockSampler) instead of being fetched and collated row by row; batch_sampler=False restores the
+    per-row DataLoader. num_workers, pin_memory, persistent_workers and prefetch_factor are passed to the
+    DataLoaders; the last two only take effect with num_workers > 0.
+
+    sampling ("weighted", "stratified" or "subsample") replaces the uniform shuffle of the training data by a
+    seeded ClassSampler over the classes of y_train, configured by class_weights, num_samples, max_per_class
+    and seed; see ClassSampler. Defaults to None (uniform shuffle).
+    """
+    def __init__(self, X_train, y_train, X_test, y_test, batch_size=32, batch_sampler=True, num_workers=0,
+                 pin_memory=False, persistent_workers=False, prefetch_factor=None, sampling=None, class_weights=None,
+                 num_samples=None, max_per_class=None, seed=0):
         super().__init__()
         self.X_train = X_train
         self.y_train = y_train
         self.X_test = X_test
         self.y_test = y_test
         self.batch_size = batch_size
+        self._loader_settings(batch_sampler, num_workers, pin_memory, persistent_workers, prefetch_factor)
+        self._sampling_settings(sampling, class_weights, num_samples, max_per_class, seed)
 
     def setup(self, stage=None):
-        # Convert to tensors
-        self.train_dataset = TensorDataset(torch.from_numpy(self.X_train).float(), torch.from_numpy(self.y_train).long())
-        self.test_dataset = TensorDataset(torch.from_numpy(self.X_test).float(), torch.from_numpy(self.y_test).long())
+        # Memory-mapped splits (packed or not) stay on disk and are converted batch by batch
+        if _is_memmap(self.X_train) or _is_memmap(self.y_train):
+            self.train_dataset = MemmapDataset(self.X_train, self.y_train)
+            self.test_dataset = MemmapDataset(self.X_test, self.y_test)
+            self.widths = {}
+            return
+        self.widths = dict(x_width=_bit_width(self.X_train), y_width=_bit_width(self.y_train))
+        # Convert to tensors, keeping compact integer dtypes (see get_dataset(..., compact=True)) until batching
+        self.train_dataset = TensorDataset(_compact_tensor(self.X_train, torch.float32), _compact_tensor(self.y_train, torch.long))
+        self.test_dataset = TensorDataset(_compact_tensor(self.X_test, torch.float32), _compact_tensor(self.y_test, torch.long))
+
+    def _collate_fn(self):
+        # MemmapDataset rows come out unpacked already
+        return CastCollate(batched=self.batch_sampler, **self.widths)
 
     def train_dataloader(self):
-        return DataLoader(self.train_dataset, batch_size=self.batch_size, shuffle=True)
+        return self._dataloader(self.train_dataset, shuffle=True)
 
     def val_dataloader(self):
-        return DataLoader(self.test_dataset, batch_size=self.batch_size, shuffle=False)
+        return self._dataloader(self.test_dataset, shuffle=False)
+
+def one_hot_batch(X, num_tokens):
+    """
+    One-hot encodes a (batch, length) tensor of token indices into a float tensor of shape
+    (batch, length*num_tokens), laid out like torch.nn.functional.one_hot(x).float().flatten() applied to each row.
+    Raises ValueError for a token outside [0, num_tokens), as torch.nn.functional.one_hot does.
+    """
+    X = X.long()
+    # Out-of-range tokens would otherwise be scattered into a neighbouring position's slots
+    if X.numel() and (X.min() < 0 or X.max() >= num_tokens):
+        raise ValueError(f"one_hot_batch got token values in [{X.min().item()}, {X.max().item()}], "
+                         f"outside [0, {num_tokens}).")
+    offsets = torch.arange(X.shape[1], device=X.device) * num_tokens
+    out = torch.zeros(X.shape[0], X.shape[1] * num_tokens, device=X.device)
+    return out.scatter_(1, X + offsets, 1.0)
 
-class OneHotDataModule(LightningDataModule):
-    def __init__(self, X_train, y_train, X_test, y_test, num_tokens, batch_size=32):
+
+class OneHotCollate(CastCollate):
+    """collate_fn that stacks (tokens, label) items (unless batched) and one-hot encodes the whole batch at once."""
+    def __init__(self, num_tokens, x_width=None, y_width=None, batched=False):
+        super().__init__(x_width=x_width, y_width=y_width, batched=batched)
+        self.num_tokens = num_tokens
+
+    def __call__(self, batch):
+        X, y = self._stack(batch)
+        return one_hot_batch(X, self.num_tokens), y.long()
+
+
+class OneHotDataModule(_LoaderMixin, LightningDataModule):
+    """
+    Keeps the inputs as integer token tensors and expands them to one-hot per batch, so memory scales with
+    the number of tokens instead of input_size*num_tokens.
+
+    encoding="one_hot" (default) yields float batches of shape (batch, input_size*num_tokens), as before.
+    With on_device=True the expansion is done in on_after_batch_transfer, i.e. on the training device,
+    instead of in the DataLoader collate_fn. encoding="index" yields the (batch, input_size) long token
+    indices unchanged, for models that start with nn.Embedding(num_tokens, ...).
+
+    The DataLoader settings (batch_sampler, num_workers, pin_memory, persistent_workers, prefetch_factor) and
+    the class sampling settings (sampling, class_weights, num_samples, max_per_class, seed) work as in CombDataModule.
+    """
+    def __init__(self, X_train, y_train, X_test, y_test, num_tokens, batch_size=32, encoding="one_hot", on_device=False,
+                 batch_sampler=True, num_workers=0, pin_memory=False, persistent_workers=False, prefetch_factor=None,
+                 sampling=None, class_weights=None, num_samples=None, max_per_class=None, seed=0):
         super().__init__()
+        if encoding not in ("one_hot", "index"):
+            raise ValueError(f'encoding must be "one_hot" or "index", not {encoding!r}.')
         self.X_train = X_train
         self.y_train = y_train
         self.X_test = X_test
         self.y_test = y_test
         self.num_tokens = num_tokens
         self.batch_size = batch_size
+        self.encoding = encoding
+        self.on_device = on_device
+        self._loader_settings(batch_sampler, num_workers, pin_memory, persistent_workers, prefetch_factor)
+        self._sampling_settings(sampling, class_weights, num_samples, max_per_class, seed)
 
     def setup(self, stage=None):
-        # Convert to tensors
-        X_train_one_hot = torch.stack( [  F.one_hot( torch.tensor(x).long(), num_classes = self.num_tokens ).float().flatten() for x in self.X_train ])
-        X_test_one_hot = torch.stack( [  F.one_hot( torch.tensor(x).long(), num_classes = self.num_tokens ).float().flatten() for x in self.X_test])
+        # Keep the integer tokens in their stored dtype; one-hot and index casts happen per batch
+        if _is_memmap(self.X_train) or _is_memmap(self.y_train):
+            self.train_dataset = MemmapDataset(self.X_train, self.y_train, x_dtype=None)
+            self.test_dataset = MemmapDataset(self.X_test, self.y_test, x_dtype=None)
+            self.widths = {}
+            return
+        self.widths = dict(x_width=_bit_width(self.X_train), y_width=_bit_width(self.y_train))
+        self.train_dataset = TensorDataset(_compact_tensor(self.X_train, torch.long), _compact_tensor(self.y_train, torch.long))
+        self.test_dataset = TensorDataset(_compact_tensor(self.X_test, torch.long), _compact_tensor(self.y_test, torch.long))
+
+    def _collate_fn(self):
+        # MemmapDataset rows come out unpacked already
+        widths = dict(self.widths, batched=self.batch_sampler)
+        if self.encoding == "one_hot" and not self.on_device:
+            return OneHotCollate(self.num_tokens, **widths)
+        # Compact tokens travel to the device as stored and are expanded there
+        return CastCollate(x_dtype=None if self.on_device else torch.long, **widths)
 
-        self.train_dataset = TensorDataset(X_train_one_hot, torch.from_numpy(self.y_train).long())
-        self.test_dataset = TensorDataset(X_test_one_hot, torch.from_numpy(self.y_test).long())
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        if self.on_device:
+            X, y = batch
+            return (one_hot_batch(X, self.num_tokens) if self.encoding == "one_hot" else X.long()), y
+        return batch
 
     def train_dataloader(self):
-        return DataLoader(self.train_dataset, batch_size=self.batch_size, shuffle = True)
+        return self._dataloader(self.train_dataset, shuffle=True)
 
     def val_dataloader(self):
-        return DataLoader(self.test_dataset, batch_size=self.batch_size, shuffle = False)
+        return self._dataloader(self.test_dataset, shuffle=False)
 
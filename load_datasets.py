@@ -1,19 +1,68 @@
-import torch
 import os
 import random
-import pickle as pkl
+import importlib
 import numpy as np
-import math
-import ast
-from typing import Optional
-
-def get_dataset(data: str, n: Optional[int] = None, folder = "./"):
+import json
+import shutil
+import tempfile
+import hashlib
+import itertools
+import functools
+import time
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Union
+
+import parsers
+from permutations import inversion_vectors
+
+CACHE_VERSION = 2
+CACHE_ARRAYS = ("X_train", "y_train", "X_test", "y_test")
+CACHE_META = ("input_size", "output_size", "num_tokens")
+OVERLAP_ARRAYS = ("hashes_train", "hashes_test", "representative")
+
+# Names of the quiver data files, in the order load_quiver_data reads them
+QUIVER_FILES = [
+    'A_11_bmatrices_test.csv',
+    'BD_11_depth9_bmatrices_train.csv',
+    'D_11_bmatrices_test.csv',
+    'A_11_bmatrices_train.csv',
+    'BE_11_depth8_bmatrices_test.csv',
+    'D_11_bmatrices_train.csv',
+    'BB_11_depth10_bmatrices_test.csv',
+    'BE_11_depth8_bmatrices_train.csv',
+    'E_11_depth9_bmatrices_test.csv',
+    'BB_11_depth10_bmatrices_train.csv',
+    'DE_11_depth9_bmatrices_test.csv',
+    'E_11_depth9_bmatrices_train.csv',
+    'BD_11_depth9_bmatrices_test.csv',
+    'DE_11_depth9_bmatrices_train.csv'
+]
+
+# Class symbols of the quiver mutation classes
+QUIVER_CLASSES = {
+    'A_11': 0,
+    'BD_11': 1,
+    'D_11': 2,
+    'BE_11': 3,
+    'BB_11': 4,
+    'E_11': 5,
+    'DE_11': 6
+}
+
+# Registered datasets by name, see register_dataset
+DATASETS = {}
+
+
+def get_dataset(data: str, n: Optional[int] = None, folder = "./", cache_dir: Optional[str] = None, rebuild_cache: bool = False, mmap: bool = False,
+                num_workers: int = 1, compact: bool = False, packed: bool = False, verbose: bool = True):
     """
     Parameters:
     ----------
-    data (str): Must be either "weaving", "rsk", "schubert", "quiver", "mheight", "symmetric_group_char", "grassmannian_cluster_algebras", "kl_polynomial", or "lattice_path"
+    data (str): Must be either "weaving", "rsk", "schubert", "quiver", "mheight", "symmetric_group_char", "grassmannian_cluster_algebras", "kl_polynomial", or "lattice_path",
+        or another dataset added with register_dataset
     n (int): 
-        - n = 6, 7, or 8 for "weaving"
+        - n = 6, 7, or 8 for "weaving" (other sizes from 3 to 16 can be generated with weaving_patterns.py --dataset)
         - n = 8, 9, or 10 for "rsk"
         - n = 3, 4, 5, or 6 for "schubert"
         - n = 10, 11, or 12 for "mheight"
@@ -22,398 +71,1218 @@ def get_dataset(data: str, n: Optional[int] = None, folder = "./"):
         - n = 10, 11, 12, or 13 for "lattice_path"
         - There are not multiple values of n for the "quiver" and "grassmannian_cluster_algebras" datasetes
     folder (str, optional): Base directory for dataset files. Defaults to "./".
+    cache_dir (str, optional): Directory for the binary cache. When given, the final arrays are written there as .npy files
+        on the first load and reopened on later calls instead of parsing the text files. The cache entry is keyed by
+        dataset, n, folder and the size/mtime of every source file, so editing the data invalidates it. Defaults to None (no cache).
+    rebuild_cache (bool, optional): Ignore any existing cache entry and rebuild it from the text files. Defaults to False.
+    mmap (bool, optional): Return read-only np.memmap arrays over the cached .npy files instead of loading them into memory,
+        so processes on the same host share the page cache. Requires cache_dir; the cache is built first if needed. Defaults to False.
+    num_workers (int, optional): Number of processes used to parse the independent train/test (and per-class) files
+        concurrently; the "schubert" files are also split into byte ranges parsed in parallel. Results are merged in
+        the same order as a serial load, so the arrays are identical. Defaults to 1.
+    compact (bool, optional): Store X and y in the smallest integer dtype that holds their values (see compact_dtype)
+        instead of int64. The DataModules keep this storage and cast per batch. Defaults to False.
+    packed (bool, optional): Return every 2D array whose entries are all 0 or 1 (e.g. mheight inputs, rsk targets,
+        lattice path inputs) as a PackedBits, 8 entries per byte, in memory and in the cache. The DataModules unpack
+        per batch. Defaults to False.
+    verbose (bool, optional): Print a description of the dataset. Defaults to True.
 
     Returns:
     --------
-    tuple: A tuple containing the following elements: X_train (np.array), y_train (np.array), X_test (np.array), y_test (np.array), input_size (int), output_size (int), num_tokens (int)
-    """
-
-    if data == "weaving":
-        assert n in {6, 7, 8}, f"Can't handle n={n}. n must be 6, 7, or 8."
-
-        X_train = [
-            ast.literal_eval(line)
-            for line in open( os.path.join(folder, f"weaving_patterns/weaving_pattern_train_{n}.txt"), 'r')
-        ]
-        X_test = [
-            ast.literal_eval(line)
-            for line in open( os.path.join(folder, f"weaving_patterns/weaving_pattern_test_{n}.txt"), 'r')
-        ]
-        y_train = [ast.literal_eval(line) for line in open( os.path.join(folder, f"weaving_patterns/labels_train_{n}.txt"), 'r')
-                ]
-        y_test = [ast.literal_eval(line) for line in open( os.path.join(folder, f"weaving_patterns/labels_test_{n}.txt"), 'r')
-                ]
-        
-        input_size = len(X_train[0])
-        output_size = 2
-        
-        num_tokens = np.max(X_train) + 1
-        
-        
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Inputs are sequences of length {input_size} with entries between 0 and {num_tokens-1}, representing weaving patterns.")
-        print(f"There are {output_size} classes. Weaving patterns are labeled 1, non-weaving patterns are labeled 0.")
-        return (np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test), input_size, output_size, num_tokens)
-
-    elif data == "rsk":
-        assert n in {8, 9, 10}, f"Can't handle n={n}. n must be 8, 9, or 10."
-        base_path = os.path.join(folder, "./robinson-schensted/input_permutations")
-        
-        X_train = process_rsk(n, folder, "train")
-        X_test = process_rsk(n, folder, "test")
-
-        max_input_length = max( max([len(x) for x in X_train]),  max([len(x) for x in X_test]) )
-
-        X_train_padded = [ np.array(row + [n+2]*(max_input_length - len(row) ) ) for row in X_train]
-        X_test_padded  = [ np.array( row + [n+2]*(max_input_length - len(row) ) ) for row in X_test]
-        
-        y_train_permutation = [
-                    ast.literal_eval(line)
-                    for line in open(f"{base_path}_{n}_train.txt", 'r')
-                ]
-        
-        y_train = [inversion_vector(p) for p in y_train_permutation]
-        
-        y_test_permutation = [
-                    ast.literal_eval(line)
-                    for line in open(f"{base_path}_{n}_test.txt", 'r')
-                ]
-        
-        y_test = [inversion_vector(p) for p in y_test_permutation]
-        
-        output_size = len(y_train[0])
-        num_tokens = n+3
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Input sequence is length {max_input_length} with entries 0 through {num_tokens-1}, representing two concatenated SSYT, padded so that all inputs have the same length.")
-        print(f"Outputs are binary sequences of length {len(y_train[0])}. Output is one permutation represented by its inversion sequence.")
-        return np.array(X_train_padded), np.array(y_train), np.array(X_test_padded), np.array(y_test), max_input_length, output_size, num_tokens
-
-    elif data == "schubert":
-        assert n in {3, 4, 5, 6}, f"Can't handle n={n}. n must be 3, 4, 5, or 6."
-
-        max_n = 2*n-1
-        X_train = [
-                    ast.literal_eval(line)[:3]
-                    for line in open( os.path.join(folder, f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_train.txt"), 'r')
-                ]
-
-        y_train = [
-                    ast.literal_eval(line)[3:][0]
-                    for line in open( os.path.join(folder, f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_train.txt"), 'r')
-                ]
-        X_test = [
-                    ast.literal_eval(line)[:3]
-                        for line in open( os.path.join(folder, f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_test.txt"), 'r')
-                ]
-        y_test = [
-                    ast.literal_eval(line)[3:][0]
-                        for line in open( os.path.join(folder, f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_test.txt"), 'r')
-                ]
-        X_train_flattened = [row[0] + row[1] + row[2] + list(range( len(row[2]) +1, max_n+1)) for row in X_train]
-        X_test_flattened = [row[0] + row[1] + row[2] + list(range( len(row[2]) +1 , max_n+1)) for row in X_test]
-
-        input_size = len(X_train_flattened[0])
-        output_size = max(max(y_train), max(y_test) ) + 1
-        num_tokens =  max_n+1 
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Inputs are sequences of length {input_size}, which represent three concatenated permutations on the letters 1 through {num_tokens-1}.")
-        print(f"There are {output_size} classes, which give the structure constant for the input permutations.")
-        return (np.array(X_train_flattened), np.array(y_train), np.array(X_test_flattened), np.array(y_test), input_size, output_size, num_tokens)
-
-
-    elif data == "symmetric_group_char":
-        assert n in {18, 20, 22}, f"Can't handle n={n}. n must be 18, 20, or 22."
-
-        train = [
-                ast.literal_eval(line)
-                for line in open( os.path.join(folder, f"symmetric_group_char/sym_grp_char_{n}_train.txt"), 'r')
-            ]
-        test = [
-                ast.literal_eval(line)
-                for line in open( os.path.join(folder, f"symmetric_group_char/sym_grp_char_{n}_test.txt"), 'r')
-            ]
-        input_size = 2*n
-        X_train = [  p1 + [0]*(n- len(p1) ) + p2 + [0]*(n- len(p2) )   for (p1, p2, char) in train]
-        y_train = [char for (p1, p2, char) in train]
-        X_test = [ p1 + [0]*(n- len(p1) ) +   p2 + [0]*(n- len(p2) )  for (p1, p2, char) in test]
-        y_test = [char for (p1, p2, char) in test]
-
-        output_size = 1
-        num_tokens = max(np.max(X_train), np.max(X_test)) + 1
-        X_train, y_train, X_test, y_test = np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test)
-        min_val = min(np.min(y_train), np.min(y_test))
-        y_train, y_test = y_train,  y_test
-        print(y_train[:10])
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Inputs are sequences of length {input_size} with entries 0 through {num_tokens-1}, which represent two concatenated integer partitions of n={n}.")
-        print(f"There are {output_size} classes for n={n}.")
-        
-        return (X_train.reshape(X_train.shape[0], -1), y_train, X_test.reshape(X_test.shape[0], -1), y_test, input_size, output_size, num_tokens)
-
-    elif data == "quiver":
-        path_to_files = os.path.join(folder, "./cluster_algebra_quivers/")
-        train_data, test_data = load_quiver_data(path_to_files)
-
-        X_train_unshuffled = np.array([data[0] for data in train_data])
-        y_train_unshuffled = np.array([data[1] for data in train_data])
-        X_test_unshuffled = np.array([data[0] for data in test_data])
-        y_test_unshuffled = np.array([data[1] for data in test_data])
-
-        X_train, y_train = shuffle_data(X_train_unshuffled, y_train_unshuffled)
-        X_test, y_test = shuffle_data(X_test_unshuffled, y_test_unshuffled)
-
-        input_size = len(X_train[0])
-        output_size = len(set(y_train))  # Assuming unique classes from y_train
-        num_tokens = max(len(np.unique(X_train)), len(np.unique(X_test))) + 1
-        rescale = max( np.abs(np.min(X_train)),  np.abs(np.min(X_test)) )
-        X_train, X_test = X_train + rescale, X_test + rescale
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Input sequences of length {input_size} are flattened adjacency matrices with entries 0 through {num_tokens-1}")
-        print(f"There are {output_size} classes: A_11: 0, BD_11: 1, D_11: 2, BE_11: 3, BB_11: 4, E_11: 5, DE_11: 6")
-        return (X_train, np.array(y_train), X_test, np.array(y_test), input_size, output_size, num_tokens)
-
-    elif data == "mheight":
-        assert n in {8, 9, 10, 11, 12}, f"Can't handle n={n}. n must be 8, 9, 10, 11 or 12."
-
-        base_path = os.path.join(folder, "./mheight_function/mHeight")
-
-        #We filtered out all classes that contained less than 0.01% of the data
-        largest_class = 4
-
-        mheight_train = np.loadtxt(f"{base_path}_{n}_train.txt", dtype = str, delimiter = ";")
-        mheight_test = np.loadtxt(f"{base_path}_{n}_test.txt", dtype = str, delimiter = ";")
-
-        X_train, y_train = parse_mheight_data(mheight_train)
-        X_test, y_test = parse_mheight_data(mheight_test)
-
-        num_classes = len(set(y_train+y_test))
-        
-        input_size = len(X_train[0])
-        output_size = num_classes
-        num_tokens = n
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Input sequences are permutations represented by their inversion sequence, which is a binary sequence of length ({n} choose 2)= {input_size}.")
-        print(f"There are {output_size} classes")
-        print(output_size)
-        return (np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test), input_size, output_size, num_tokens)
-
-
-    elif data == "grassmannian_cluster_algebras":
-        base_path = os.path.join(folder, "grassmannian_cluster_algebras/3_4_12")
-        X_train = [
-            ast.literal_eval(str(line).replace("][", "],["))
-            for line in open(f'{base_path}_valid_train.txt', 'r')
-        ] + [
-            ast.literal_eval(str(line).replace("][", "],["))
-            for line in open(f'{base_path}_invalid_train.txt', 'r')
-        ]
-        X_test = [
-            ast.literal_eval(str(line).replace("][", "],["))
-            for line in open(f'{base_path}_valid_test.txt', 'r')
-        ] + [
-            ast.literal_eval(str(line).replace("][", "],["))
-            for line in open(f'{base_path}_invalid_test.txt', 'r')
-        ]
-        y_train = [1] * (len(X_train) // 2 )+ [0] * (len(X_train) // 2)
-        y_test = [1] * (len(X_test) // 2) + [0] * (len(X_test) // 2)
-        input_size = len(X_train[0]) * len(X_train[0][0])  # Assuming all data points have the same shape
-        output_size = 2  # Valid or invalid
-        X_train_unshuffled, y_train_unshuffled, X_test_unshuffled, y_test_unshuffled = np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test)
-        
-#
-        X_train, y_train = shuffle_data(X_train_unshuffled, y_train_unshuffled)
-        X_test, y_test = shuffle_data(X_test_unshuffled, y_test_unshuffled)
-        X_train = np.array(X_train)
-        y_train = np.array(y_train)
-        X_test = np.array(X_test)
-        y_test = np.array(y_test)
-        
-        num_tokens = max(np.max(X_train), np.max(X_test)) + 1
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Inputs are sequences of length {input_size}, with {num_tokens} tokens, which represent 3x4 SSYT")
-        print(f"There are {output_size} classes. SSYT that index a valid cluster variable are labeled 1 and SSYT that do not are labeled 0.")
-        return (X_train.reshape(X_train.shape[0], -1), y_train, X_test.reshape(X_test.shape[0], -1), y_test, input_size, output_size, num_tokens)
-
-    elif data == "kl_polynomial":
-        assert n in {4, 5, 6, 7, 8}, f"Can't handle n={n}. n must be 8, 9, or 10."
-
-        path_to_files = os.path.join(folder, "kl-polynomials/")
-        train_data, test_data = load_kl_polynomial_data(path_to_files, n)
-
-        # Extracting features and labels from the loaded data
-        # Assuming each datum contains three lists: two for features and one for labels
-        X_train = np.array([np.concatenate((datum[0], datum[1])) for datum in train_data])
-        max_coeff_train = max([len(i[2]) for i in train_data])
-        max_coeff_test = max([len(i[2]) for i in test_data])
-        max_coeff = max(max_coeff_train,max_coeff_test)
-
-        # Pad polynomials with zero coefficients
-        for i in train_data:
-            temp = i[2]
-            temp = temp + (max_coeff - len(temp))*[0]
-            i[2] = temp
-        for i in test_data:
-            temp = i[2]
-            temp = temp + (max_coeff - len(temp))*[0]
-            i[2] = temp
-        
-        y_train = np.array([datum[2] for datum in train_data])
-        X_test = np.array([np.concatenate((datum[0], datum[1])) for datum in test_data])
-        y_test = np.array([datum[2] for datum in test_data])
-
-        input_size = len(X_train[0])  # Assuming all feature vectors are of the same size
-        output_size = max(np.max(y_train), np.max(y_test)) + 1
-        num_tokens = max(np.max(X_train), np.max(X_test)) + 1
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Inputs are sequences of length {input_size}, representing two permutations on the letters 0 through {num_tokens-1}")
-        print(f"There are {output_size} classes, which each represent the fifth coefficient in the polynomial.")
-        return (X_train, y_train, X_test, y_test, input_size, output_size, num_tokens)
-
-    elif data == "lattice_path":
-        assert n in {10, 11, 12, 13}, f"Can't handle {n}"
-        file_path = os.path.join(folder, "./lattice_paths/")
-
-        # Determine the specific file names based on the given 'n'
-        size = f"{n}_{n-1}"
-
-        # Load train and test data for the specified size
-        train_data, test_data = load_lattice_path_dataset(size, file_path)
-
-        # Extract features and labels from the loaded data
-        X_train_unshuffled = np.array([data[0] for data in train_data])
-        y_train_unshuffled = np.array([data[1] for data in train_data])
-        X_test_unshuffled = np.array([data[0] for data in test_data])
-        y_test_unshuffled = np.array([data[1] for data in test_data])
-
-        X_train, y_train = shuffle_data(X_train_unshuffled, y_train_unshuffled)
-        X_test, y_test = shuffle_data(X_test_unshuffled, y_test_unshuffled)
-        
-        input_size = len(X_train[0])
-        output_size = 2
-        num_tokens = max(np.max(X_train), np.max(X_test)) + 1
-
-        print(f"Train set has {len(X_train)} examples")
-        print(f"Test set has {len(X_test)} examples")
-        print(f"Inputs are two concatenated binary sequences represented a lattice path and its cover. The input for n={n} is length {input_size}.")
-        print(f"There are {output_size} classes. Lagrange covers are labeled 0, matching covers are labeled 1.")
-        
-        return np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test), input_size, output_size, num_tokens 
-
-    else:
-        raise NotImplementedError(f'No {data}. Supported options are "weaving", "rsk", "schubert", "quiver", "mheight", "symmetric_group_char", "grassmannian_cluster_algebras", "kl_polynomial", or "lattice_path".')
-
-
-
-def parse_mheight_data(mheight_set):
-    #sequences = [ [int(x) for _, x in enumerate(row.split(';')[0])] for _, row in enumerate(mheight_set) if int(row.split(';')[1]) <= largest_class ]
-    #labels = [ int(row.split(';')[1]) for _, row in enumerate(mheight_set) if int(row.split(';')[1]) <= largest_class ]
-    sequences = [i[0].replace('(', '').replace(')', '') for i in mheight_set]
-    sequences = [i.split(",") for i in sequences]
-    sequences = [[int(j) for j in i] for i in sequences]
-    labels = [int(i[1]) for i in mheight_set]
-    return sequences, labels
-
-
-def load_lattice_path_dataset(size, file_path):
-    '''Helper function for loading the lattice path data, written by Henry Kvinge.'''
+    LoadedDataset: Unpacks like the tuple X_train (np.array), y_train (np.array), X_test (np.array), y_test (np.array), input_size (int), output_size (int), num_tokens (int),
+        and also holds per-split class counts, dataset-specific metadata (e.g. num_coeffs and max_coeff for "kl_polynomial")
+        and the time spent in each loading phase.
+    """
+    log = print if verbose else _quiet
+    timer = _PhaseTimer()
+    if cache_dir is None and mmap:
+        raise ValueError("mmap=True needs a cache_dir to hold the memory-mapped .npy files.")
+
+    if cache_dir is not None:
+        path = cache_path(data, n, folder, cache_dir, compact, packed)
+        if os.path.isdir(path) and not rebuild_cache:
+            dataset, metadata = _read_cache(path, mmap_mode="r" if mmap else None)
+            timer.lap("cache_read")
+            log(f"Loaded {data} (n={n}) from cache {path}")
+            log(f"Train set has {len(dataset[0])} examples")
+            log(f"Test set has {len(dataset[2])} examples")
+            return LoadedDataset.build(data, n, dataset, timer.timings, metadata)
+
+    dataset = _load_dataset(data, n, folder, num_workers, log, timer)
+    metadata = _dataset_metadata(data, dataset)
+    dataset = _format_dataset(dataset, compact, packed)
+    timer.lap("convert")
+    if cache_dir is not None:
+        _write_cache(path, dataset, metadata, replace=rebuild_cache)
+        if mmap:
+            # Drop the parsed copies and hand back views of the entry (ours, or one another process finished first)
+            del dataset
+            dataset, metadata = _read_cache(path, mmap_mode="r")
+        timer.lap("cache_write")
+    return LoadedDataset.build(data, n, dataset, timer.timings, metadata)
+
+
+@dataclass
+class LoadedDataset:
+    """
+    Result of get_dataset. Iterating or indexing it gives the usual 7-tuple
+    (X_train, y_train, X_test, y_test, input_size, output_size, num_tokens), so existing unpacking keeps working.
+
+    class_counts maps "train"/"test" to {label: count} for classification datasets with one label per example,
+    and is None otherwise. metadata holds values a dataset reports beyond the tuple (see DatasetSpec.metadata),
+    and is kept in the cache. timings maps each loading phase ("parse", "pad", "shuffle", "convert", "cache_read",
+    "cache_write") that ran to the seconds spent in it.
+    """
+    data: str
+    n: Optional[int]
+    X_train: np.ndarray
+    y_train: np.ndarray
+    X_test: np.ndarray
+    y_test: np.ndarray
+    input_size: int
+    output_size: int
+    num_tokens: int
+    class_counts: Optional[dict] = None
+    timings: dict = field(default_factory=dict)
+    metadata: dict = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, data, n, dataset, timings, metadata=None):
+        X_train, y_train, X_test, y_test, input_size, output_size, num_tokens = dataset
+        class_counts = None
+        if output_size > 1 and all(isinstance(y, np.ndarray) and y.ndim == 1 for y in (y_train, y_test)):
+            class_counts = {split: dict(zip(*(values.tolist() for values in np.unique(y, return_counts=True))))
+                            for split, y in (("train", y_train), ("test", y_test))}
+        return cls(data, n, X_train, y_train, X_test, y_test, input_size, output_size, num_tokens, class_counts, timings,
+                   dict(metadata or {}))
+
+    def select_targets(self, columns):
+        """
+        Returns a LoadedDataset that keeps only the given columns of 2D targets, e.g. one coefficient of
+        "kl_polynomial" (an int, giving 1D targets) or a range of coefficients for a multi-target head (a slice).
+        Ints and slices give views of y_train and y_test, memory-mapped ones included, so nothing is copied;
+        a list of columns copies, and packed targets are unpacked. output_size becomes the number of classes of
+        the selected columns, read from metadata["target_classes"] when the dataset reports it.
+        """
+        y_train, y_test = (np.asarray(y) if isinstance(y, PackedBits) else y for y in (self.y_train, self.y_test))
+        y_train, y_test = y_train[:, columns], y_test[:, columns]
+        if "target_classes" in self.metadata:
+            output_size = max(np.atleast_1d(np.asarray(self.metadata["target_classes"])[columns]).tolist())
+        else:
+            output_size = max(int(np.max(y_train)), int(np.max(y_test))) + 1
+        class_counts = None
+        if y_train.ndim == 1:
+            class_counts = {split: {label: int(count) for label, count in enumerate(np.bincount(y, minlength=output_size)) if count}
+                            for split, y in (("train", y_train), ("test", y_test))}
+        return replace(self, y_train=y_train, y_test=y_test, output_size=output_size, class_counts=class_counts)
+
+    def as_tuple(self):
+        return (self.X_train, self.y_train, self.X_test, self.y_test, self.input_size, self.output_size, self.num_tokens)
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __getitem__(self, idx):
+        return self.as_tuple()[idx]
+
+    def __len__(self):
+        return 7
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """
+    Registry entry for one dataset, see register_dataset.
+
+    files maps n to the data file names, relative to the dataset folder. load, stream and layout are the
+    functions behind get_dataset, iter_dataset and stream_layout, given as callables or as "module:function"
+    strings that are only imported when the dataset is first used. stream(n, folder, split, layout) returns
+    the split's sources as (paths, decode) pairs: decode turns one chunk of lines of each of the paths,
+    read in step, into an (X, y) batch. sizes holds the supported values of n, or is
+    None for datasets without n. input_size, output_size, num_tokens and y_shape map n to what get_dataset
+    returns when the file format fixes it, and are None (or hold None) when it depends on the data. Every
+    array get_dataset returns has the given dtype, unless compact or packed storage is asked for. metadata,
+    when given, maps the loaded 7-tuple to a dict of extra JSON values, which get_dataset stores in
+    LoadedDataset.metadata and in the cache.
+    """
+    name: str
+    files: Callable
+    load: Union[Callable, str]
+    stream: Union[Callable, str, None] = None
+    layout: Union[Callable, str, None] = None
+    sizes: Optional[frozenset] = None
+    input_size: Optional[Callable] = None
+    output_size: Optional[Callable] = None
+    num_tokens: Optional[Callable] = None
+    y_shape: Callable = lambda n: ()
+    dtype: str = "int64"
+    description: str = ""
+    metadata: Union[Callable, str, None] = None
+
+    def check(self, n):
+        if self.sizes is not None:
+            assert n in self.sizes, f"Can't handle n={n}. n must be one of {sorted(self.sizes)}."
+
+
+def register_dataset(spec):
+    """
+    Adds a dataset to the registry, so that get_dataset, iter_dataset, dataset_info and the cache functions
+    accept spec.name. Registering a name again replaces the previous entry. Returns spec.
+    """
+    DATASETS[spec.name] = spec
+    return spec
+
+
+def dataset_spec(data):
+    if data not in DATASETS:
+        options = ", ".join(f'"{name}"' for name in DATASETS)
+        raise NotImplementedError(f'No {data}. Supported options are {options}.')
+    return DATASETS[data]
+
+
+def _resolve(target):
+    """Returns the function behind a "module:function" string, importing the module on first use."""
+    if isinstance(target, str):
+        module, name = target.split(":")
+        return getattr(importlib.import_module(module), name)
+    return target
+
+
+def dataset_info(data: str, n: Optional[int] = None, folder = "./", cache_dir: Optional[str] = None):
+    """
+    Describes a dataset without loading it: its files, input_size, output_size, num_tokens, x_shape and y_shape
+    of one example and dtype. Values that depend on the data are None, unless cache_dir holds an up-to-date
+    entry for (data, n, folder); they are then read from it, together with the number of train and test rows
+    and the dataset's metadata (e.g. num_coeffs and max_coeff for "kl_polynomial").
+    """
+    spec = dataset_spec(data)
+    spec.check(n)
+    info = {
+        "data": data,
+        "n": n,
+        "files": dataset_files(data, n, folder),
+        "input_size": spec.input_size(n) if spec.input_size else None,
+        "output_size": spec.output_size(n) if spec.output_size else None,
+        "num_tokens": spec.num_tokens(n) if spec.num_tokens else None,
+        "y_shape": spec.y_shape(n),
+        "dtype": spec.dtype,
+        "description": spec.description,
+    }
+    if cache_dir is not None and all(os.path.exists(f) for f in info["files"]):
+        path = cache_path(data, n, folder, cache_dir)
+        if os.path.isdir(path):
+            with open(os.path.join(path, "meta.json"), 'r') as f:
+                meta = json.load(f)
+            info.update({name: meta[name] for name in CACHE_META})
+            info.update(meta["metadata"])
+            # Only the .npy headers are read
+            for split in ("train", "test"):
+                X, y = (np.load(os.path.join(path, f"{name}_{split}.npy"), mmap_mode="r") for name in ("X", "y"))
+                info[f"num_{split}"] = len(X)
+            info["y_shape"] = y.shape[1:]
+    info["x_shape"] = (info["input_size"],)
+    return info
+
+
+class _PhaseTimer:
+    """Adds the time since the previous lap to the named phase."""
+    def __init__(self):
+        self.timings = {}
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self.last
+        self.last = now
+
+
+def _no_timer(phase):
+    pass
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def _load_dataset(data, n, folder, num_workers=1, log=print, timer=None):
+    spec = dataset_spec(data)
+    spec.check(n)
+    lap = timer.lap if timer is not None else _no_timer
+    return _resolve(spec.load)(n, folder, num_workers, log, lap)
+
+
+def _dataset_metadata(data, dataset):
+    spec = dataset_spec(data)
+    return {} if spec.metadata is None else _resolve(spec.metadata)(dataset)
+
+
+def _load_weaving(n, folder, num_workers, log, lap):
+    X_train, X_test, (y_train, _), (y_test, _) = _run_parallel([
+        (parsers.parse_int_matrix, os.path.join(folder, f"weaving_patterns/weaving_pattern_train_{n}.txt")),
+        (parsers.parse_int_matrix, os.path.join(folder, f"weaving_patterns/weaving_pattern_test_{n}.txt")),
+        (parsers.parse_int_rows, os.path.join(folder, f"weaving_patterns/labels_train_{n}.txt")),
+        (parsers.parse_int_rows, os.path.join(folder, f"weaving_patterns/labels_test_{n}.txt")),
+    ], num_workers)
+    lap("parse")
+
+    input_size = len(X_train[0])
+    output_size = 2
+
+    num_tokens = np.max(X_train) + 1
+
+    dataset = (np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test), input_size, output_size, num_tokens)
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Inputs are sequences of length {input_size} with entries between 0 and {num_tokens-1}, representing weaving patterns.")
+    log(f"There are {output_size} classes. Weaving patterns are labeled 1, non-weaving patterns are labeled 0.")
+    return dataset
+
+
+def _load_rsk(n, folder, num_workers, log, lap):
+    base_path = os.path.join(folder, "./robinson-schensted/input_permutations")
+
+    X_train, X_test, y_train_permutation, y_test_permutation = _run_parallel([
+        (process_rsk, n, folder, "train"),
+        (process_rsk, n, folder, "test"),
+        (parsers.parse_int_matrix, f"{base_path}_{n}_train.txt"),
+        (parsers.parse_int_matrix, f"{base_path}_{n}_test.txt"),
+    ], num_workers)
+    lap("parse")
+    max_input_length = max(_longest_row(X_train[1]), _longest_row(X_test[1]))
+
+    X_train = parsers.ragged_to_dense(*X_train, max_input_length, n+2)
+    X_test = parsers.ragged_to_dense(*X_test, max_input_length, n+2)
+
+    y_train = inversion_vectors(y_train_permutation)
+
+    y_test = inversion_vectors(y_test_permutation)
+    lap("pad")
+
+    output_size = len(y_train[0])
+    num_tokens = n+3
+    dataset = X_train, np.array(y_train), X_test, np.array(y_test), max_input_length, output_size, num_tokens
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Input sequence is length {max_input_length} with entries 0 through {num_tokens-1}, representing two concatenated SSYT, padded so that all inputs have the same length.")
+    log(f"Outputs are binary sequences of length {len(y_train[0])}. Output is one permutation represented by its inversion sequence.")
+    return dataset
+
+
+def _load_schubert(n, folder, num_workers, log, lap):
+    max_n = 2*n-1
+    # One pass per file reads the three permutations and the coefficient of every line together
+    (*train_parts, y_train), (*test_parts, y_test) = _parse_sharded(parsers.parse_lists_and_scalar, [
+        os.path.join(folder, f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_{split}.txt")
+        for split in ("train", "test")
+    ], num_workers, args=(3,), ragged=(1, 3, 5))
+    lap("parse")
+    # Missing letters of the upper permutation are filled in as fixed points
+    X_train = _flatten_schubert(*train_parts, max_n)
+    X_test = _flatten_schubert(*test_parts, max_n)
+    lap("pad")
+
+    input_size = len(X_train[0])
+    output_size = max(max(y_train), max(y_test) ) + 1
+    num_tokens =  max_n+1 
+    dataset = (X_train, np.array(y_train), X_test, np.array(y_test), input_size, output_size, num_tokens)
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Inputs are sequences of length {input_size}, which represent three concatenated permutations on the letters 1 through {num_tokens-1}.")
+    log(f"There are {output_size} classes, which give the structure constant for the input permutations.")
+    return dataset
+
+
+def _load_symmetric_group_char(n, folder, num_workers, log, lap):
+    (*train_parts, y_train), (*test_parts, y_test) = _run_parallel([
+        (parsers.parse_lists_and_scalar, os.path.join(folder, f"symmetric_group_char/sym_grp_char_{n}_{split}.txt"), 2)
+        for split in ("train", "test")
+    ], num_workers)
+    lap("parse")
+    input_size = 2*n
+    X_train = _flatten_partition_pairs(*train_parts, n)
+    X_test = _flatten_partition_pairs(*test_parts, n)
+    lap("pad")
+
+    output_size = 1
+    num_tokens = max(np.max(X_train), np.max(X_test)) + 1
+    min_val = min(np.min(y_train), np.min(y_test))
+    y_train, y_test = y_train,  y_test
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Inputs are sequences of length {input_size} with entries 0 through {num_tokens-1}, which represent two concatenated integer partitions of n={n}.")
+    log(f"There are {output_size} classes for n={n}.")
+
+    return (X_train.reshape(X_train.shape[0], -1), y_train, X_test.reshape(X_test.shape[0], -1), y_test, input_size, output_size, num_tokens)
+
+
+def _load_quiver(n, folder, num_workers, log, lap):
+    path_to_files = os.path.join(folder, "./cluster_algebra_quivers/")
+    X_train_unshuffled, y_train_unshuffled, X_test_unshuffled, y_test_unshuffled = load_quiver_data(path_to_files, num_workers)
+    lap("parse")
+
+    X_train, y_train = shuffle_data(X_train_unshuffled, y_train_unshuffled)
+    X_test, y_test = shuffle_data(X_test_unshuffled, y_test_unshuffled)
+    lap("shuffle")
+
+    input_size = len(X_train[0])
+    output_size = len(set(y_train))  # Assuming unique classes from y_train
+    num_tokens = max(len(np.unique(X_train)), len(np.unique(X_test))) + 1
+    rescale = max( np.abs(np.min(X_train)),  np.abs(np.min(X_test)) )
+    X_train, X_test = X_train + rescale, X_test + rescale
+    dataset = (X_train, np.array(y_train), X_test, np.array(y_test), input_size, output_size, num_tokens)
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Input sequences of length {input_size} are flattened adjacency matrices with entries 0 through {num_tokens-1}")
+    log(f"There are {output_size} classes: A_11: 0, BD_11: 1, D_11: 2, BE_11: 3, BB_11: 4, E_11: 5, DE_11: 6")
+    return dataset
+
+
+def _load_mheight(n, folder, num_workers, log, lap):
+    base_path = os.path.join(folder, "./mheight_function/mHeight")
+
+    #We filtered out all classes that contained less than 0.01% of the data
+    largest_class = 4
+
+    (X_train, y_train), (X_test, y_test) = _run_parallel([
+        (parsers.parse_mheight, f"{base_path}_{n}_{split}.txt") for split in ("train", "test")
+    ], num_workers)
+    lap("parse")
+
+    num_classes = len(np.unique(np.concatenate((y_train, y_test))))
+
+    input_size = len(X_train[0])
+    output_size = num_classes
+    num_tokens = n
+    dataset = (np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test), input_size, output_size, num_tokens)
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Input sequences are permutations represented by their inversion sequence, which is a binary sequence of length ({n} choose 2)= {input_size}.")
+    log(f"There are {output_size} classes")
+    return dataset
+
+
+def _load_grassmannian(n, folder, num_workers, log, lap):
+    base_path = os.path.join(folder, "grassmannian_cluster_algebras/3_4_12")
+    valid_train, invalid_train, valid_test, invalid_test = _run_parallel([
+        (parsers.parse_int_matrix, f'{base_path}_{kind}_{split}.txt') for split in ("train", "test") for kind in ("valid", "invalid")
+    ], num_workers)
+    lap("parse")
+    X_train = np.concatenate((valid_train, invalid_train))
+    X_test = np.concatenate((valid_test, invalid_test))
+    y_train = [1] * (len(X_train) // 2 )+ [0] * (len(X_train) // 2)
+    y_test = [1] * (len(X_test) // 2) + [0] * (len(X_test) // 2)
+    input_size = X_train.shape[1]  # Each row holds the 3x4 tableau in row-major order
+    output_size = 2  # Valid or invalid
+    X_train_unshuffled, y_train_unshuffled, X_test_unshuffled, y_test_unshuffled = np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test)
+
+    X_train, y_train = shuffle_data(X_train_unshuffled, y_train_unshuffled)
+    X_test, y_test = shuffle_data(X_test_unshuffled, y_test_unshuffled)
+    lap("shuffle")
+    X_train = np.array(X_train)
+    y_train = np.array(y_train)
+    X_test = np.array(X_test)
+    y_test = np.array(y_test)
+
+    num_tokens = max(np.max(X_train), np.max(X_test)) + 1
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Inputs are sequences of length {input_size}, with {num_tokens} tokens, which represent 3x4 SSYT")
+    log(f"There are {output_size} classes. SSYT that index a valid cluster variable are labeled 1 and SSYT that do not are labeled 0.")
+    return (X_train.reshape(X_train.shape[0], -1), y_train, X_test.reshape(X_test.shape[0], -1), y_test, input_size, output_size, num_tokens)
+
+
+def _load_kl_polynomial(n, folder, num_workers, log, lap):
+    path_to_files = os.path.join(folder, "kl-polynomials/")
+    (X_train, *train_coeffs), (X_test, *test_coeffs) = load_kl_polynomial_data(path_to_files, n, num_workers)
+    lap("parse")
+    num_coeffs = max(_longest_row(train_coeffs[1]), _longest_row(test_coeffs[1]))
+
+    # Pad polynomials with zero coefficients
+    y_train = parsers.ragged_to_dense(*train_coeffs, num_coeffs, 0)
+    y_test = parsers.ragged_to_dense(*test_coeffs, num_coeffs, 0)
+    lap("pad")
+
+    input_size = len(X_train[0])  # Assuming all feature vectors are of the same size
+    output_size = max(np.max(y_train), np.max(y_test)) + 1
+    num_tokens = max(np.max(X_train), np.max(X_test)) + 1
+    lap("convert")
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Inputs are sequences of length {input_size}, representing two permutations on the letters 0 through {num_tokens-1}")
+    log(f"Targets are the {num_coeffs} coefficients of the polynomial, padded with zeros, with values 0 through {output_size-1}. "
+        f"LoadedDataset.select_targets picks out single coefficients.")
+    return (X_train, y_train, X_test, y_test, input_size, output_size, num_tokens)
+
+
+def _kl_polynomial_metadata(dataset):
+    """
+    num_coeffs is the number of columns of y (the longest polynomial), max_coeff the largest coefficient and
+    target_classes the number of classes of each coefficient, for LoadedDataset.select_targets.
+    """
+    _, y_train, _, y_test, *_ = dataset
+    column_max = np.maximum(y_train.max(axis=0, initial=0), y_test.max(axis=0, initial=0))
+    return {"num_coeffs": int(y_train.shape[1]), "max_coeff": int(column_max.max(initial=0)),
+            "target_classes": (column_max + 1).tolist()}
+
+
+def _load_lattice_path(n, folder, num_workers, log, lap):
+    file_path = os.path.join(folder, "./lattice_paths/")
+
+    # Determine the specific file names based on the given 'n'
+    size = f"{n}_{n-1}"
+
+    # Load train and test data for the specified size
+    X_train_unshuffled, y_train_unshuffled, X_test_unshuffled, y_test_unshuffled = load_lattice_path_dataset(size, file_path, num_workers)
+    lap("parse")
+
+    X_train, y_train = shuffle_data(X_train_unshuffled, y_train_unshuffled)
+    X_test, y_test = shuffle_data(X_test_unshuffled, y_test_unshuffled)
+    lap("shuffle")
+
+    input_size = len(X_train[0])
+    output_size = 2
+    num_tokens = max(np.max(X_train), np.max(X_test)) + 1
+    dataset = np.array(X_train), np.array(y_train), np.array(X_test), np.array(y_test), input_size, output_size, num_tokens
+    lap("convert")
+
+    log(f"Train set has {len(X_train)} examples")
+    log(f"Test set has {len(X_test)} examples")
+    log(f"Inputs are two concatenated binary sequences represented a lattice path and its cover. The input for n={n} is length {input_size}.")
+    log(f"There are {output_size} classes. Lagrange covers are labeled 0, matching covers are labeled 1.")
+
+    return dataset
+
+
+def iter_dataset(data: str, n: Optional[int] = None, split: str = "train", chunk_size: int = 65536, folder = "./",
+                 layout: Optional[dict] = None, num_shards: int = 1, shard: int = 0, seed = None, index: Optional[list] = None):
+    """
+    Streams one split of a dataset as NumPy batches, holding only one chunk of the files in memory at a time.
+
+    Parameters:
+    ----------
+    data (str): Dataset name, see get_dataset.
+    n (int): Size parameter, see get_dataset.
+    split (str): "train" or "test".
+    chunk_size (int, optional): Maximum number of rows per yielded batch. Chunks never span two files. Defaults to 65536.
+    folder (str, optional): Base directory for dataset files. Defaults to "./".
+    layout (dict, optional): Output of stream_layout for (data, n, folder). Computed when not given; pass it in
+        when streaming from several workers so the files are only scanned once.
+    num_shards, shard (int, optional): Only yield the chunks whose running index is shard modulo num_shards.
+        The other chunks are skipped without being parsed. Defaults to a single shard.
+    seed (optional): When given, the chunks of all files of the split are read in a random order drawn from
+        this seed (anything np.random.default_rng accepts), so chunks of different files (and classes) are
+        interleaved. All shards must get the same seed. Defaults to None (file order).
+    index (list, optional): Output of stream_index for (data, n, split, chunk_size, folder), used with seed.
+        Computed when not given; pass it in to avoid rescanning the files every epoch.
+
+    Yields:
+    --------
+    tuple: X_chunk (np.array), y_chunk (np.array). Rows are padded and flattened exactly as in get_dataset,
+    but "quiver", "lattice_path" and "grassmannian_cluster_algebras" are not shuffled and Grassmannian labels
+    come from the file (valid or invalid) each row was read from.
+    """
+    assert split in {"train", "test"}, f"split must be 'train' or 'test', not {split}."
+    if layout is None:
+        layout = stream_layout(data, n, folder)
+    sources = _stream_sources(data, n, folder, split, layout)
+
+    if seed is None:
+        count = itertools.count()
+        for paths, decode in sources:
+            # Paired files (inputs and labels) are read in step
+            for chunks in zip(*(parsers.iter_line_chunks(path, chunk_size) for path in paths)):
+                if next(count) % num_shards == shard:
+                    yield decode(*chunks)
+        return
+
+    if index is None:
+        index = stream_index(data, n, split, chunk_size, folder)
+    order = np.random.default_rng(seed).permutation(len(index))
+    for i in order[shard::num_shards]:
+        source, ranges = index[i]
+        paths, decode = sources[source]
+        yield decode(*(parsers.read_range(path, start, stop) for path, (start, stop) in zip(paths, ranges)))
+
+
+def stream_index(data: str, n: Optional[int] = None, split: str = "train", chunk_size: int = 65536, folder = "./"):
+    """
+    Returns the chunks iter_dataset reads from one split, as a list of (source, ranges) pairs: source numbers
+    the file (or pair of files) and ranges holds the (start, stop) bytes of the chunk in each of its files.
+    Used by iter_dataset(..., seed=...) to read the chunks in any order. Scans every file once.
+    """
+    index = []
+    for source, (paths, _) in enumerate(_stream_sources(data, n, folder, split, {})):
+        ranges = zip(*(parsers.line_chunk_ranges(path, chunk_size) for path in paths))
+        index.extend((source, chunk) for chunk in ranges)
+    return index
+
+
+def _stream_sources(data, n, folder, split, layout):
+    spec = dataset_spec(data)
+    spec.check(n)
+    if spec.stream is None:
+        raise NotImplementedError(f"{data} does not support streaming.")
+    return _resolve(spec.stream)(n, folder, split, layout)
+
+
+def _decode_labeled(parse, label, chunk, shift=0):
+    X = parse(chunk) + shift
+    return X, np.full(len(X), label)
+
+
+def _stream_weaving(n, folder, split, layout):
+    X_path, y_path = (os.path.join(folder, f"weaving_patterns/{kind}_{split}_{n}.txt") for kind in ("weaving_pattern", "labels"))
+    return [((X_path, y_path), _decode_weaving)]
+
+
+def _decode_weaving(X_chunk, y_chunk):
+    return parsers.parse_int_matrix(X_chunk), parsers.parse_int_rows(y_chunk)[0]
+
+
+def _stream_rsk(n, folder, split, layout):
+    base_path = os.path.join(folder, "robinson-schensted")
+    X_path, y_path = f"{base_path}/output_tableau_pairs_{n}_{split}.txt", f"{base_path}/input_permutations_{n}_{split}.txt"
+    return [((X_path, y_path), functools.partial(_decode_rsk, n, layout))]
+
+
+def _decode_rsk(n, layout, X_chunk, y_chunk):
+    X = parsers.ragged_to_dense(*parsers.parse_rsk_tableaux(X_chunk, n), layout["width"], n+2)
+    y = inversion_vectors(parsers.parse_int_matrix(y_chunk))
+    return X, y
+
+
+def _stream_schubert(n, folder, split, layout):
+    path = os.path.join(folder, f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_{split}.txt")
+    return [((path,), functools.partial(_decode_schubert, 2*n-1))]
+
+
+def _decode_schubert(max_n, chunk):
+    *parts, y = parsers.parse_lists_and_scalar(chunk, 3)
+    return _flatten_schubert(*parts, max_n), y
+
+
+def _stream_symmetric_group_char(n, folder, split, layout):
+    path = os.path.join(folder, f"symmetric_group_char/sym_grp_char_{n}_{split}.txt")
+    return [((path,), functools.partial(_decode_symmetric_group_char, n))]
+
+
+def _decode_symmetric_group_char(n, chunk):
+    *parts, y = parsers.parse_lists_and_scalar(chunk, 2)
+    return _flatten_partition_pairs(*parts, n), y
+
+
+def _stream_quiver(n, folder, split, layout):
+    sources = []
+    for f in QUIVER_FILES:
+        if ('train' if 'train' in f else 'test') != split:
+            continue
+        class_name = f.split('_')
+        label = QUIVER_CLASSES[class_name[0] + '_' + class_name[1]]
+        sources.append(((os.path.join(folder, "cluster_algebra_quivers", f),), functools.partial(_decode_quiver, label, layout)))
+    return sources
+
+
+def _decode_quiver(label, layout, chunk):
+    return _decode_labeled(parsers.parse_quiver, label, chunk, layout["rescale"])
+
+
+def _stream_mheight(n, folder, split, layout):
+    return [((os.path.join(folder, f"mheight_function/mHeight_{n}_{split}.txt"),), parsers.parse_mheight)]
+
+
+def _stream_grassmannian(n, folder, split, layout):
+    return [((os.path.join(folder, f"grassmannian_cluster_algebras/3_4_12_{kind}_{split}.txt"),),
+             functools.partial(_decode_labeled, parsers.parse_int_matrix, label))
+            for kind, label in (("valid", 1), ("invalid", 0))]
+
+
+def _stream_kl_polynomial(n, folder, split, layout):
+    return [((os.path.join(folder, f"kl-polynomials/kl_polynomials_{n}_{split}.txt"),), functools.partial(_decode_kl_polynomial, layout))]
+
+
+def _decode_kl_polynomial(layout, chunk):
+    X, coeffs, offsets = parsers.parse_kl_polynomial(chunk)
+    return X, parsers.ragged_to_dense(coeffs, offsets, layout["num_coeffs"], 0)
+
+
+def _stream_lattice_path(n, folder, split, layout):
+    poset_label = {'lagrange': 0, 'matching': 1}
+    return [((os.path.join(folder, f"lattice_paths/{order}_covers_{split}_{n}_{n-1}.csv"),),
+             functools.partial(_decode_labeled, parsers.parse_lattice_path, poset_label[order]))
+            for order in ('lagrange', 'matching')]
+
+
+def stream_layout(data: str, n: Optional[int] = None, folder = "./"):
+    """
+    Scans the train and test files once, block by block, for the dataset-wide values that iter_dataset needs
+    to match get_dataset: the padded input length for "rsk", the number of coefficients for "kl_polynomial"
+    and the offset added to the "quiver" matrices. Returns an empty dict for the other datasets.
+    """
+    def scan(paths, statistic):
+        return [statistic(block) for path in paths for block in parsers.iter_blocks(path)]
+
+    spec = dataset_spec(data)
+    return {} if spec.layout is None else _resolve(spec.layout)(n, folder, scan)
+
+
+def _layout_rsk(n, folder, scan):
+    paths = [os.path.join(folder, f"robinson-schensted/output_tableau_pairs_{n}_{split}.txt") for split in ("train", "test")]
+    return {"width": max(scan(paths, lambda b: _longest_row(parsers.parse_rsk_tableaux(b, n)[1])))}
+
+
+def _layout_kl_polynomial(n, folder, scan):
+    paths = [os.path.join(folder, f"kl-polynomials/kl_polynomials_{n}_{split}.txt") for split in ("train", "test")]
+    return {"num_coeffs": max(scan(paths, lambda b: _longest_row(parsers.parse_kl_polynomial(b)[2])))}
+
+
+def _layout_quiver(n, folder, scan):
+    minima = []
+    for split in ("train", "test"):
+        paths = [os.path.join(folder, "cluster_algebra_quivers", f) for f in QUIVER_FILES if ('train' if 'train' in f else 'test') == split]
+        minima.append(min(scan(paths, lambda b: int(np.min(parsers.parse_quiver(b))))))
+    return {"rescale": int(max(np.abs(minima[0]), np.abs(minima[1])))}
+
+
+register_dataset(DatasetSpec(
+    "weaving",
+    files=lambda n: [f"weaving_patterns/{kind}_{split}_{n}.txt" for kind in ("weaving_pattern", "labels") for split in ("train", "test")],
+    load=_load_weaving, stream=_stream_weaving, sizes=frozenset(range(3, 17)),
+    input_size=lambda n: n*(n-1), output_size=lambda n: 2, num_tokens=lambda n: n+1,
+    description="Flattened n x (n-1) matrices; weaving patterns are labeled 1, non-weaving patterns 0.",
+))
+register_dataset(DatasetSpec(
+    "rsk",
+    files=lambda n: [f"robinson-schensted/{kind}_{n}_{split}.txt" for kind in ("output_tableau_pairs", "input_permutations") for split in ("train", "test")],
+    load=_load_rsk, stream=_stream_rsk, layout=_layout_rsk, sizes=frozenset({8, 9, 10}),
+    output_size=lambda n: n*(n-1)//2, num_tokens=lambda n: n+3, y_shape=lambda n: (n*(n-1)//2,),
+    description="Padded pairs of SSYT; the target is the inversion sequence of the permutation.",
+))
+register_dataset(DatasetSpec(
+    "schubert",
+    files=lambda n: [f"schubert_polynomial_coeff/schubert_structure_coefficients_triples_{n}_{split}.txt" for split in ("train", "test")],
+    load=_load_schubert, stream=_stream_schubert, sizes=frozenset({3, 4, 5, 6}),
+    num_tokens=lambda n: 2*n,
+    description="Three concatenated permutations; the class is their Schubert structure coefficient.",
+))
+register_dataset(DatasetSpec(
+    "symmetric_group_char",
+    files=lambda n: [f"symmetric_group_char/sym_grp_char_{n}_{split}.txt" for split in ("train", "test")],
+    load=_load_symmetric_group_char, stream=_stream_symmetric_group_char, sizes=frozenset({18, 20, 22}),
+    input_size=lambda n: 2*n, output_size=lambda n: 1,
+    description="Two concatenated partitions of n padded with zeros; the target is the character value.",
+))
+register_dataset(DatasetSpec(
+    "quiver",
+    files=lambda n: [f"cluster_algebra_quivers/{f}" for f in QUIVER_FILES],
+    load=_load_quiver, stream=_stream_quiver, layout=_layout_quiver,
+    output_size=lambda n: len(QUIVER_CLASSES),
+    description="Flattened, shifted adjacency matrices of quivers; the class is the mutation class.",
+))
+register_dataset(DatasetSpec(
+    "mheight",
+    files=lambda n: [f"mheight_function/mHeight_{n}_{split}.txt" for split in ("train", "test")],
+    load=_load_mheight, stream=_stream_mheight, sizes=frozenset({8, 9, 10, 11, 12}),
+    input_size=lambda n: n*(n-1)//2, num_tokens=lambda n: n,
+    description="Inversion sequences of permutations; the class is the mHeight.",
+))
+register_dataset(DatasetSpec(
+    "grassmannian_cluster_algebras",
+    files=lambda n: [f"grassmannian_cluster_algebras/3_4_12_{kind}_{split}.txt" for kind in ("valid", "invalid") for split in ("train", "test")],
+    load=_load_grassmannian, stream=_stream_grassmannian,
+    input_size=lambda n: 12, output_size=lambda n: 2,
+    description="3x4 SSYT in row-major order; those that index a cluster variable are labeled 1, the others 0.",
+))
+register_dataset(DatasetSpec(
+    "kl_polynomial",
+    files=lambda n: [f"kl-polynomials/kl_polynomials_{n}_{split}.txt" for split in ("train", "test")],
+    load=_load_kl_polynomial, stream=_stream_kl_polynomial, layout=_layout_kl_polynomial, sizes=frozenset({4, 5, 6, 7}),
+    y_shape=lambda n: (None,), metadata=_kl_polynomial_metadata,
+    description="Two concatenated permutations; the target is the zero-padded coefficient vector of their KL polynomial.",
+))
+register_dataset(DatasetSpec(
+    "lattice_path",
+    files=lambda n: [f"lattice_paths/{order}_covers_{split}_{n}_{n-1}.csv" for order in ("lagrange", "matching") for split in ("train", "test")],
+    load=_load_lattice_path, stream=_stream_lattice_path, sizes=frozenset({10, 11, 12, 13}),
+    output_size=lambda n: 2,
+    description="A lattice path and its cover as two binary sequences; Lagrange covers are labeled 0, matching covers 1.",
+))
+
+
+def _longest_row(offsets):
+    return int(np.diff(offsets).max(initial=0))
+
+
+def _flatten_schubert(alpha, alpha_offsets, beta, beta_offsets, gamma, gamma_offsets, max_n):
+    """
+    Lays out parsed schubert triples as rows alpha + beta + gamma, with gamma extended to max_n letters by
+    fixed points, written straight into one preallocated array.
+    """
+    widths = [_longest_row(alpha_offsets), _longest_row(beta_offsets), max_n]
+    X = np.empty((len(alpha_offsets)-1, sum(widths)), dtype=gamma.dtype)
+    starts = np.cumsum([0] + widths)
+    parts = [(alpha, alpha_offsets, 0), (beta, beta_offsets, 0), (gamma, gamma_offsets, np.arange(1, max_n+1))]
+    for (values, offsets, fill), start, stop in zip(parts, starts[:-1], starts[1:]):
+        parsers.ragged_to_dense(values, offsets, fill=fill, out=X[:, start:stop])
+    return X
+
+
+def _flatten_partition_pairs(p1, p1_offsets, p2, p2_offsets, n):
+    """Lays out parsed partition pairs as rows p1 + p2, each padded with zeros to n parts."""
+    X = np.empty((len(p1_offsets)-1, 2*n), dtype=p1.dtype)
+    parsers.ragged_to_dense(p1, p1_offsets, out=X[:, :n])
+    parsers.ragged_to_dense(p2, p2_offsets, out=X[:, n:])
+    return X
+
+
+def dataset_files(data: str, n: Optional[int] = None, folder = "./"):
+    """
+    Lists the text files that get_dataset reads for a given dataset and n.
+    """
+    return [os.path.join(folder, name) for name in dataset_spec(data).files(n)]
+
+
+def cache_path(data: str, n: Optional[int] = None, folder = "./", cache_dir = "./cache", compact: bool = False, packed: bool = False):
+    """
+    Returns the cache directory used for (data, n, folder). The name ends in a key built from the absolute
+    folder path and the size and modification time of every source file, so a changed file maps to a new entry.
+    Compact and packed entries (see get_dataset) are kept apart from the plain ones.
+    """
+    key = hashlib.sha1()
+    key.update(f"{CACHE_VERSION}|{data}|{n}|{os.path.abspath(folder)}".encode())
+    if compact:
+        key.update(b"|compact")
+    if packed:
+        key.update(b"|packed")
+    for f in dataset_files(data, n, folder):
+        stat = os.stat(f)
+        key.update(f"|{os.path.basename(f)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return os.path.join(cache_dir, f"{data}_{n}_{key.hexdigest()[:16]}")
+
+
+def clear_cache(cache_dir = "./cache", data: Optional[str] = None, n: Optional[int] = None):
+    """
+    Deletes cache entries written by get_dataset. With data (and optionally n) given, only the entries
+    for that dataset are removed. Returns the list of removed directories.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    prefix = "" if data is None else (f"{data}_" if n is None else f"{data}_{n}_")
+    removed = []
+    for name in sorted(os.listdir(cache_dir)):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and os.path.isfile(os.path.join(path, "meta.json")):
+            shutil.rmtree(path)
+            removed.append(path)
+    return removed
+
+
+def compact_dtype(*arrays):
+    """
+    Returns the smallest of uint8, int8, int16, int32 and int64 that holds every value of the given integer arrays.
+    uint16 is skipped because torch has little support for it.
+    """
+    arrays = [np.asarray(a) for a in arrays if np.size(a)]
+    if not arrays:
+        return np.dtype(np.uint8)
+    low = min(int(a.min()) for a in arrays)
+    high = max(int(a.max()) for a in arrays)
+    for dtype in (np.uint8, np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def compact_dataset(dataset):
+    """
+    Casts the X and y arrays of a get_dataset tuple to compact_dtype, shared by the train and test split.
+    Non-integer arrays are left unchanged.
+    """
+    X_train, y_train, X_test, y_test, *meta = dataset
+    X_train, X_test, y_train, y_test = (np.asarray(a) for a in (X_train, X_test, y_train, y_test))
+    arrays = []
+    for train, test in ((X_train, X_test), (y_train, y_test)):
+        if train.dtype.kind in "iub" and test.dtype.kind in "iub":
+            dtype = compact_dtype(train, test)
+            train, test = train.astype(dtype, copy=False), test.astype(dtype, copy=False)
+        arrays.append((train, test))
+    (X_train, X_test), (y_train, y_test) = arrays
+    return (X_train, y_train, X_test, y_test, *meta)
+
+
+class PackedBits:
+    """
+    A 2D array of 0/1 entries stored with np.packbits along each row, 8 entries per byte. `packed` holds the
+    (N, ceil(width/8)) uint8 array and `width` the unpacked row length. Indexing unpacks the selected rows,
+    and np.asarray(...) unpacks the whole array.
+    """
+    def __init__(self, packed, width):
+        self.packed = packed
+        self.width = width
+
+    @classmethod
+    def pack(cls, array):
+        array = np.asarray(array)
+        return cls(np.packbits(array.astype(np.uint8, copy=False), axis=1), array.shape[1])
+
+    @property
+    def shape(self):
+        return (len(self.packed), self.width)
+
+    @property
+    def dtype(self):
+        return np.dtype(np.uint8)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def __len__(self):
+        return len(self.packed)
+
+    def __getitem__(self, idx):
+        return np.unpackbits(self.packed[idx], axis=-1, count=self.width)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.unpack()
+        return array if dtype is None else array.astype(dtype)
+
+    def unpack(self):
+        return np.unpackbits(self.packed, axis=1, count=self.width)
+
+
+def _is_bits(array):
+    return array.ndim == 2 and array.dtype.kind in "iub" and array.size > 0 and array.min() >= 0 and array.max() <= 1
+
+
+def pack_dataset(dataset):
+    """
+    Replaces the X and y arrays of a get_dataset tuple by PackedBits when both the train and test array are
+    2D with only 0/1 entries. Other arrays are left unchanged.
+    """
+    X_train, y_train, X_test, y_test, *meta = dataset
+    arrays = []
+    for train, test in ((X_train, X_test), (y_train, y_test)):
+        train, test = np.asarray(train), np.asarray(test)
+        if _is_bits(train) and _is_bits(test):
+            train, test = PackedBits.pack(train), PackedBits.pack(test)
+        arrays.append((train, test))
+    (X_train, X_test), (y_train, y_test) = arrays
+    return (X_train, y_train, X_test, y_test, *meta)
+
+
+def _format_dataset(dataset, compact=False, packed=False):
+    if compact:
+        dataset = compact_dataset(dataset)
+    if packed:
+        dataset = pack_dataset(dataset)
+    return dataset
+
+
+def _read_cache(path, mmap_mode=None):
+    """Returns the cached 7-tuple and metadata dict."""
+    with open(os.path.join(path, "meta.json"), 'r') as f:
+        meta = json.load(f)
+    arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in CACHE_ARRAYS]
+    widths = meta.get("packed", {})
+    arrays = [PackedBits(array, widths[name]) if name in widths else array for name, array in zip(CACHE_ARRAYS, arrays)]
+    return (*arrays, *[meta[name] for name in CACHE_META]), meta["metadata"]
+
+
+def _write_cache(path, dataset, metadata, replace=False):
+    """
+    Writes a cache entry into a temporary directory and renames it into place, so an interrupted write never
+    leaves a half-filled entry. When another process has put the entry in place first, it is kept and ours is
+    dropped, so concurrent cold loads never delete an entry that someone may be reading. Only replace=True
+    (rebuild_cache) swaps out a live entry. Returns True when our entry was installed.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f"{os.path.basename(path)}.tmp", dir=os.path.dirname(path) or ".")
+    try:
+        widths = {}
+        for name, array in zip(CACHE_ARRAYS, dataset[:4]):
+            if isinstance(array, PackedBits):
+                widths[name] = array.width
+                array = array.packed
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(array))
+        meta = {name: int(value) for name, value in zip(CACHE_META, dataset[4:])}
+        if widths:
+            meta["packed"] = widths
+        meta["metadata"] = metadata
+        meta["version"] = CACHE_VERSION
+        with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+            json.dump(meta, f)
+        if replace and os.path.isdir(path):
+            # Move the live entry aside in one rename; open memmaps of it stay valid until they are closed
+            stale_path = f"{tmp_path}.old"
+            try:
+                os.rename(path, stale_path)
+            except OSError:
+                pass
+            else:
+                shutil.rmtree(stale_path, ignore_errors=True)
+        try:
+            # Renaming a directory onto an existing entry fails instead of replacing it
+            os.rename(tmp_path, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+            return False
+        return True
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def row_hashes(X, dtype=None, chunk_size=1 << 16):
+    """
+    Returns a 64-bit hash of every row of a 2D integer array (np.ndarray, np.memmap or PackedBits). Rows are
+    hashed by value: they are first cast to dtype (by default compact_dtype(X)), so int64, compact and packed
+    copies of the same data hash alike when given the same dtype. The bytes of each row are mixed in 8 at a
+    time, for chunk_size rows at once.
+    """
+    if dtype is None:
+        dtype = _hash_dtype(X)
+    hashes = np.empty(len(X), dtype=np.uint64)
+    for start in range(0, len(X), chunk_size):
+        block = np.asarray(X[start:start + chunk_size])
+        raw = np.ascontiguousarray(block.reshape(len(block), -1).astype(dtype, copy=False)).view(np.uint8)
+        raw = np.pad(raw, ((0, 0), (0, -raw.shape[1] % 8)))
+        h = np.full(len(raw), raw.shape[1], dtype=np.uint64)
+        for word in raw.view(np.uint64).T:
+            h ^= word
+            h *= np.uint64(0x9E3779B97F4A7C15)
+            h ^= h >> np.uint64(32)
+        # splitmix64 finalizer
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+        hashes[start:start + len(h)] = h
+    return hashes
+
+
+def _hash_dtype(*arrays):
+    # PackedBits only hold 0 and 1, so their values are not scanned
+    return compact_dtype(*(np.array([0, 1]) if isinstance(a, PackedBits) else a for a in arrays))
+
+
+def _gather_rows(train, test, idx, chunk_size=1 << 16):
+    """Yields the rows idx of train and test concatenated, chunk_size at a time."""
+    for start in range(0, len(idx), chunk_size):
+        chunk = idx[start:start + chunk_size]
+        in_train = chunk < len(train)
+        parts = np.asarray(train[chunk[in_train]]), np.asarray(test[chunk[~in_train] - len(train)])
+        rows = np.empty((len(chunk),) + parts[0].shape[1:], dtype=np.result_type(*parts))
+        rows[in_train], rows[~in_train] = parts
+        yield rows
+
+
+@dataclass
+class OverlapIndex:
+    """
+    Groups the input rows of a train and test split by content, see overlap_index. Rows are numbered train
+    first, then test: representative[i] is the first row equal to row i, or i itself. Rows are matched by
+    their row_hashes and then compared, so a hash collision never merges different rows (the colliding rows
+    are just not deduplicated).
+    """
+    hashes_train: np.ndarray
+    hashes_test: np.ndarray
+    representative: np.ndarray
+
+    @classmethod
+    def build(cls, X_train, X_test):
+        dtype = _hash_dtype(X_train, X_test)
+        hashes_train, hashes_test = row_hashes(X_train, dtype), row_hashes(X_test, dtype)
+        hashes = np.concatenate([hashes_train, hashes_test])
+        # A stable sort puts the lowest row number first in every group of equal hashes
+        order = np.argsort(hashes, kind="stable")
+        sorted_hashes = hashes[order]
+        starts = np.flatnonzero(np.concatenate([[True], sorted_hashes[1:] != sorted_hashes[:-1]]))
+        representative = np.empty(len(hashes), dtype=np.int64)
+        representative[order] = np.repeat(order[starts], np.diff(np.append(starts, len(hashes))))
+
+        candidates = np.flatnonzero(representative != np.arange(len(hashes)))
+        equal = np.concatenate([np.ones(0, dtype=bool)] + [
+            (a.reshape(len(a), -1) == b.reshape(len(b), -1)).all(axis=1)
+            for a, b in zip(_gather_rows(X_train, X_test, candidates), _gather_rows(X_train, X_test, representative[candidates]))
+        ])
+        representative[candidates[~equal]] = candidates[~equal]
+        return cls(hashes_train, hashes_test, representative)
+
+    @property
+    def num_train(self):
+        return len(self.hashes_train)
+
+    def train_duplicates(self):
+        """Indices of the train rows that repeat an earlier train row."""
+        train = self.representative[:self.num_train]
+        return np.flatnonzero(train != np.arange(self.num_train))
+
+    def test_duplicates(self):
+        """Indices of the test rows that repeat an earlier test row but no train row."""
+        test = self.representative[self.num_train:] - self.num_train
+        return np.flatnonzero((test >= 0) & (test != np.arange(len(test))))
+
+    def leaked(self):
+        """Indices of the test rows that also occur in the train split."""
+        return np.flatnonzero(self.representative[self.num_train:] < self.num_train)
+
+    def summary(self, y_train=None, y_test=None):
+        """
+        Counts rows, unique rows, duplicates within each split and test rows leaked from train. With the labels
+        given, label_conflicts counts the repeated rows whose label differs from that of their first occurrence.
+        """
+        rows = np.arange(len(self.representative))
+        summary = {
+            "train_rows": self.num_train,
+            "test_rows": len(self.hashes_test),
+            "unique_rows": int(np.count_nonzero(self.representative == rows)),
+            "train_duplicates": len(self.train_duplicates()),
+            "test_duplicates": len(self.test_duplicates()),
+            "leaked_test_rows": len(self.leaked()),
+        }
+        if y_train is not None and y_test is not None:
+            repeated = np.flatnonzero(self.representative != rows)
+            summary["label_conflicts"] = int(sum(
+                np.count_nonzero((a.reshape(len(a), -1) != b.reshape(len(b), -1)).any(axis=1))
+                for a, b in zip(_gather_rows(y_train, y_test, repeated), _gather_rows(y_train, y_test, self.representative[repeated]))
+            ))
+        return summary
+
+
+def overlap_index(data: str, n: Optional[int] = None, folder = "./", cache_dir: Optional[str] = None, num_workers: int = 1):
+    """
+    Builds the OverlapIndex of the inputs of get_dataset(data, n, folder), whose row numbers it refers to
+    (with or without compact, packed or mmap). With cache_dir the dataset is loaded through the cache, and the
+    index is saved as .npy files in its cache entry and reopened memory-mapped by later calls, so it is
+    rebuilt together with the entry when the data files change.
+    """
+    path = None
+    if cache_dir is not None:
+        path = cache_path(data, n, folder, cache_dir)
+        files = [os.path.join(path, f"{name}.npy") for name in OVERLAP_ARRAYS]
+        if all(os.path.isfile(f) for f in files):
+            return OverlapIndex(*(np.load(f, mmap_mode="r") for f in files))
+    dataset = get_dataset(data, n, folder, cache_dir=cache_dir, mmap=cache_dir is not None, num_workers=num_workers, verbose=False)
+    index = OverlapIndex.build(dataset.X_train, dataset.X_test)
+    if path is not None:
+        for name in OVERLAP_ARRAYS:
+            tmp_file = os.path.join(path, f"{name}.tmp{os.getpid()}.npy")
+            np.save(tmp_file, getattr(index, name))
+            os.replace(tmp_file, os.path.join(path, f"{name}.npy"))
+    return index
+
+
+def drop_duplicates(dataset, index: Optional[OverlapIndex] = None, within: bool = True, across: bool = True):
+    """
+    Returns a LoadedDataset without repeated inputs. within=True keeps only the first occurrence of a row in
+    each split, across=True removes the test rows that also occur in the train split. index defaults to
+    OverlapIndex.build on the dataset's inputs; pass the one from overlap_index to reuse the cached index.
+    """
+    if index is None:
+        index = OverlapIndex.build(dataset.X_train, dataset.X_test)
+    keep_train = np.ones(index.num_train, dtype=bool)
+    keep_test = np.ones(len(index.hashes_test), dtype=bool)
+    if within:
+        keep_train[index.train_duplicates()] = False
+        keep_test[index.test_duplicates()] = False
+    if across:
+        keep_test[index.leaked()] = False
+    X_train, y_train, X_test, y_test, *sizes = dataset.as_tuple()
+    arrays = [_take_rows(a, keep) for a, keep in ((X_train, keep_train), (y_train, keep_train), (X_test, keep_test), (y_test, keep_test))]
+    return LoadedDataset.build(dataset.data, dataset.n, (*arrays, *sizes), dataset.timings, dataset.metadata)
+
+
+def _take_rows(array, keep):
+    if isinstance(array, PackedBits):
+        return PackedBits(array.packed[keep], array.width)
+    return np.asarray(array)[keep]
+
+
+def _run_parallel(calls, num_workers = 1):
+    """
+    Runs a list of (function, *args) calls, in a pool of num_workers processes when num_workers > 1.
+    Results are returned in the order of the calls.
+    """
+    if num_workers is None or num_workers <= 1 or len(calls) <= 1:
+        return [fn(*args) for fn, *args in calls]
+    with ProcessPoolExecutor(max_workers=min(num_workers, len(calls))) as pool:
+        futures = [pool.submit(fn, *args) for fn, *args in calls]
+        return [future.result() for future in futures]
+
+
+def _parse_sharded(parse, paths, num_workers = 1, args = (), ragged = ()):
+    """
+    Parses every file with parse(path, *args). With num_workers > 1 each file is split into byte ranges on line
+    boundaries (parsers.byte_ranges) that are parsed in parallel and joined in order, so the results are the
+    same as for whole files. ragged lists the positions of offsets arrays in the results, see parsers.join_parts.
+    """
+    if num_workers is None or num_workers <= 1:
+        return [parse(path, *args) for path in paths]
+    ranges = [parsers.byte_ranges(path, num_workers) for path in paths]
+    results = iter(_run_parallel([(parse, part, *args) for parts in ranges for part in parts], num_workers))
+    return [parsers.join_parts([next(results) for _ in parts], ragged) for parts in ranges]
+
+
+def load_lattice_path_dataset(size, file_path, num_workers = 1):
+    '''Helper function for loading the lattice path data, written by Henry Kvinge.
+    Returns X_train, y_train, X_test, y_test with Lagrange covers (label 0) before matching covers (label 1).
+    The four files are parsed in num_workers processes.'''
     orders = ['lagrange', 'matching']
     split = ['train', 'test']
     poset_label = {'lagrange': 0, 'matching': 1}
-    train_data = []
-    test_data = []
-    sizes = size.split('_')
-    size1 = int(sizes[0])
-    size2 = int(sizes[1])
-
-    for order in orders:
-        for mode in split:
-            file = open(file_path + order + '_covers_' + mode + '_' + size + '.csv')
-            while True:
-                content = file.readline()
-                if not content:
-                    break
-                # Process content to remove unwanted characters and split correctly
-                content = content.strip().replace('\'', '').replace(' ', '').replace(',', '')
-                # Convert all elements to integers
-                content = [int(char) for char in content if char.isdigit()]
-
-                data_entry = [content, poset_label[order]]
-                if mode == 'train':
-                    train_data.append(data_entry)
-                else:
-                    test_data.append(data_entry)
-            file.close()
-
-    
-    return train_data, test_data
+    data = {mode: ([], []) for mode in split}
+
+    files = [(order, mode) for order in orders for mode in split]
+    parsed = _run_parallel([(parsers.parse_lattice_path, file_path + order + '_covers_' + mode + '_' + size + '.csv') for order, mode in files], num_workers)
+    for (order, mode), X in zip(files, parsed):
+        data[mode][0].append(X)
+        data[mode][1].append(np.full(len(X), poset_label[order]))
 
+    X_train, y_train = (np.concatenate(arrays) for arrays in data['train'])
+    X_test, y_test = (np.concatenate(arrays) for arrays in data['test'])
+    return X_train, y_train, X_test, y_test
 
-def load_quiver_data(path_to_files):
-    '''Helper function for loading the quiver data, written by Henry Kvinge.'''
+
+def load_quiver_data(path_to_files, num_workers = 1):
+    '''Helper function for loading the quiver data, written by Henry Kvinge.
+    Returns X_train, y_train, X_test, y_test in the order of QUIVER_FILES. The files are parsed in num_workers processes.'''
     # Names of data files
-    file_names = [
-        'A_11_bmatrices_test.csv',
-        'BD_11_depth9_bmatrices_train.csv',
-        'D_11_bmatrices_test.csv',
-        'A_11_bmatrices_train.csv',
-        'BE_11_depth8_bmatrices_test.csv',
-        'D_11_bmatrices_train.csv',
-        'BB_11_depth10_bmatrices_test.csv',
-        'BE_11_depth8_bmatrices_train.csv',
-        'E_11_depth9_bmatrices_test.csv',
-        'BB_11_depth10_bmatrices_train.csv',
-        'DE_11_depth9_bmatrices_test.csv',
-        'E_11_depth9_bmatrices_train.csv',
-        'BD_11_depth9_bmatrices_test.csv',
-        'DE_11_depth9_bmatrices_train.csv'
-    ]
+    file_names = QUIVER_FILES
 
     # Class symbols
-    class_names = {
-        'A_11': 0,
-        'BD_11': 1,
-        'D_11': 2,
-        'BE_11': 3,
-        'BB_11': 4,
-        'E_11': 5,
-        'DE_11': 6
-    }
+    class_names = QUIVER_CLASSES
 
-    train_data = []
-    test_data = []
+    data = {'train': ([], []), 'test': ([], [])}
 
     # Load data from files
-    for f in file_names:
-        file = open(path_to_files + f, "r")
+    parsed = _run_parallel([(parsers.parse_quiver, path_to_files + f) for f in file_names], num_workers)
+    for f, X in zip(file_names, parsed):
         class_name = f.split('_')
         name = class_name[0] + '_' + class_name[1]
+        mode = 'train' if 'train' in f else 'test'
+        data[mode][0].append(X)
+        data[mode][1].append(np.full(len(X), class_names[name]))
 
-        while True:
-            content = file.readline()
-            if not content:
-                break
-            content = content.split(',')
-            content = [int(i) for i in content if (i.isdigit() or i[0] == '-')]
+    X_train, y_train = (np.concatenate(arrays) for arrays in data['train'])
+    X_test, y_test = (np.concatenate(arrays) for arrays in data['test'])
+    return X_train, y_train, X_test, y_test
 
-            if 'train' in f:
-                train_data.append([content, class_names[name]])
-            elif 'test' in f:
-                test_data.append([content, class_names[name]])
-
-        file.close()
-    return train_data, test_data
-
-
-def load_kl_polynomial_data(path_to_files,size):
 
+def load_kl_polynomial_data(path_to_files,size, num_workers = 1):
+    """
+    Loads the train and test KL polynomial files for permutations of `size` letters, in num_workers processes.
+    Each split is returned as X (both permutations concatenated) with the coefficient values and offsets,
+    see parsers.parse_kl_polynomial.
+    """
     # Names of data files
 
     file_names = {4:['kl_polynomials_4_train.txt','kl_polynomials_4_test.txt'],
@@ -421,68 +1290,48 @@ def load_kl_polynomial_data(path_to_files,size):
                   6:['kl_polynomials_6_train.txt','kl_polynomials_6_test.txt'],
                   7:['kl_polynomials_7_train.txt','kl_polynomials_7_test.txt']}
 
-    # Lists to store train and test as tuples
-    train_data = []
-    test_data = []
-
-    # Load valid train Young diagrams
-
-  #  print(file_names[size])
-
-    for k,t in enumerate(file_names[size]):
-
-        file = open(path_to_files+t, "r")
-        while True:
-            content=file.readline()
-            if not content:
-                break
-            content = content.split(",")
-            perm1 = list(content[0])
-            perm2 = list(content[1])[1:]
-            coeffs = content[2:]
-            coeffs[-1] = coeffs[-1][:-1]
-            perm1 = [int(i) for i in perm1]
-            perm2 = [int(i) for i in perm2]
-            coeffs = [int(i) for i in coeffs]
-            datum = [perm1,perm2,coeffs]
-            if k == 0:
-                train_data.append(datum)
-            else:
-                test_data.append(datum)
-        file.close()
+    train_data, test_data = _run_parallel([(parsers.parse_kl_polynomial, path_to_files + t) for t in file_names[size]], num_workers)
     return train_data, test_data
 
 def process_rsk(n, folder, train_or_test = "train"):
+    """
+    Reads the RSK tableau pairs with '[' encoded as 0 and ']' as n+1. Returns the ragged (values, offsets) rows.
+    """
     base_path = os.path.join(folder, "./robinson-schensted/output_tableau_pairs")
-    processed = []
-    with open(f"{base_path}_{n}_{train_or_test}.txt", 'r') as f:
-        for line in f:
-            # Replace '[' with '0' and ']' with '9'
-            modified_line = line.replace('[', '0,').replace(']', f',{n+1}')
-            # Convert the string representation to an actual list
-            processed_list = ast.literal_eval(modified_line)
-            processed.append(list(processed_list))
-    return processed
+    return parsers.parse_rsk_tableaux(f"{base_path}_{n}_{train_or_test}.txt", n)
 
 
 
 def inversion_vector(permutation):
     """
-    Converts permutation to inversion vector format
+    Converts permutation to inversion vector format. See permutations.inversion_vectors for whole arrays.
     """
-    ret = []
-    n = len(permutation)
-    for i in range(n):
-      for j in range(i+1,n):
-        if permutation[i] > permutation[j]:
-          ret.append(1)
-        else:
-          ret.append(0)
-    return ret
+    return inversion_vectors(np.asarray([permutation]))[0].tolist()
 
-def shuffle_data(sequences, labels, s = 32):
+def shuffle_indices(num_rows, s = 32):
+    """
+    Returns the row order that shuffle_data(..., s) produces for num_rows rows: row k of the shuffled data is
+    row shuffle_indices(num_rows, s)[k] of the input. random.shuffle only depends on the length of the list,
+    so shuffling the row indices after random.seed(s) gives the same order as shuffling the rows themselves.
+    The order can also be applied lazily, e.g. with torch.utils.data.Subset(dataset, order).
+    """
     random.seed(s)
-    data = list(zip(sequences, labels))
-    random.shuffle(data)
-    sequences, labels = zip(*data)
-    return sequences, labels
+    order = list(range(num_rows))
+    random.shuffle(order)
+    return np.array(order, dtype=np.intp)
+
+
+def _take(rows, order):
+    if isinstance(rows, np.ndarray):
+        return rows[order]
+    return tuple(rows[i] for i in order)
+
+
+def shuffle_data(sequences, labels, s = 32):
+    """
+    Shuffles sequences and labels together, in the order of random.seed(s) followed by random.shuffle on the
+    list of (sequence, label) pairs. NumPy arrays are reordered with one fancy index (see shuffle_indices);
+    other sequences come back as tuples.
+    """
+    order = shuffle_indices(len(sequences), s)
+    return _take(sequences, order), _take(labels, order)
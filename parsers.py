@@ -0,0 +1,395 @@
+"""
+Bulk parsers for the text formats read by load_datasets.get_dataset.
+
+Every parser reads its file as raw bytes in blocks of whole lines and decodes all integer
+literals of a block at once with NumPy, instead of tokenizing one line at a time with
+str.replace/split/int or ast.literal_eval. Rows are the non-empty lines of the file.
+
+Formats whose rows have different lengths are returned in ragged form, as a flat array of
+values together with an offsets array: row i is values[offsets[i]:offsets[i+1]]. ragged_to_dense
+pads such rows into a 2D array.
+
+Every parse_* function takes either a file name, a (file name, start, stop) byte range such as those
+returned by byte_ranges, or the raw bytes of some whole lines of a file, such as the chunks yielded by
+iter_line_chunks or read back with read_range from line_chunk_ranges. Results parsed from consecutive
+byte ranges are joined with join_parts.
+"""
+import itertools
+import os
+
+import numpy as np
+
+BLOCK_SIZE = 1 << 24
+
+_NEWLINE, _COMMA, _MINUS, _LBRACKET, _RBRACKET = (ord(c) for c in "\n,-[]")
+_MAX_DIGITS = 18
+_POW10 = 10 ** np.arange(_MAX_DIGITS + 1, dtype=np.int64)
+
+
+def iter_blocks(path, block_size=BLOCK_SIZE, start=0, stop=None):
+    """
+    Yields the contents of a file as bytes blocks of roughly block_size that always end on a line boundary.
+    With start and stop, only the bytes in [start, stop) are read.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        rest = b""
+        while True:
+            block = f.read(block_size if stop is None else min(block_size, stop - f.tell()))
+            if not block:
+                break
+            block = rest + block
+            cut = block.rfind(b"\n") + 1
+            rest = block[cut:]
+            if cut:
+                yield block[:cut]
+        if rest:
+            yield rest
+
+
+def iter_line_chunks(path, num_lines):
+    """
+    Yields the contents of a file as bytes chunks of num_lines lines (the last chunk may be shorter).
+    """
+    with open(path, 'rb') as f:
+        while True:
+            chunk = b"".join(itertools.islice(f, num_lines))
+            if not chunk:
+                break
+            yield chunk
+
+
+def line_chunk_ranges(path, num_lines, block_size=BLOCK_SIZE):
+    """
+    Returns the (start, stop) byte offsets of the chunks iter_line_chunks(path, num_lines) yields, found
+    with a vectorized scan for newlines, so any chunk can later be read on its own with read_range.
+    """
+    bounds = [0]
+    lines = 0
+    position = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            ends = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord("\n")) + position + 1
+            # Line number lines+i+1 ends at ends[i]; a chunk ends after every num_lines lines
+            bounds.extend(ends[num_lines - 1 - lines % num_lines::num_lines].tolist())
+            lines += len(ends)
+            position += len(block)
+    if bounds[-1] < position:
+        bounds.append(position)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def read_range(path, start, stop):
+    """Returns bytes [start, stop) of a file."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(stop - start)
+
+
+def byte_ranges(path, num_ranges):
+    """
+    Splits a file into at most num_ranges (path, start, stop) byte ranges of about equal size, each starting
+    and ending on a line boundary, so that every line falls in exactly one range.
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for k in range(1, num_ranges):
+            f.seek(max(size * k // num_ranges, bounds[-1]))
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    ranges = [(path, start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    return ranges or [(path, 0, 0)]
+
+
+def join_parts(parts, ragged=()):
+    """
+    Joins the results of one parse_* function on consecutive parts of a file, in order. ragged holds the
+    positions of the offsets arrays in the results; those are shifted to index the joined values, which
+    come just before them.
+    """
+    joined = []
+    for k, arrays in enumerate(zip(*parts)):
+        if k in ragged:
+            shifts = np.cumsum([0] + [offsets[-1] for offsets in arrays[:-1]])
+            arrays = [arrays[0][:1]] + [offsets[1:] + shift for offsets, shift in zip(arrays, shifts)]
+        joined.append(np.concatenate(arrays))
+    return tuple(joined)
+
+
+def _parse_file(path, parse_block, block_size=BLOCK_SIZE):
+    if isinstance(path, (bytes, bytearray)):
+        blocks = [path]
+    elif isinstance(path, tuple):
+        blocks = iter_blocks(path[0], block_size, path[1], path[2])
+    else:
+        blocks = iter_blocks(path, block_size)
+    parts = [parse_block(np.frombuffer(block, dtype=np.uint8)) for block in blocks]
+    if not parts:
+        parts = [parse_block(np.zeros(0, dtype=np.uint8))]
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _rows(values, lengths):
+    """Reshapes flat per-row values into a 2D array, checking that every row has the same length."""
+    if len(lengths) and np.any(lengths != lengths[0]):
+        raise ValueError(f"Rows have different lengths ({lengths.min()} to {lengths.max()}).")
+    return values.reshape(len(lengths), lengths[0] if len(lengths) else 0)
+
+
+def _digit_runs(b, digit=None):
+    """
+    Finds the integer literals in a byte array.
+
+    Returns the start and stop byte positions of every maximal run of ASCII digits and its value.
+    A precomputed digit mask can be passed to restrict the search to part of the bytes.
+    """
+    if digit is None:
+        digit = (b >= 48) & (b <= 57)
+    start = digit.copy()
+    start[1:] &= ~digit[:-1]
+    pos = np.flatnonzero(digit)
+    first = np.flatnonzero(start[pos])
+    digits = (b[pos] - 48).astype(np.int64)
+    if len(first) == len(pos):
+        # Every literal is a single digit
+        return pos, pos + 1, digits
+    lengths = np.diff(np.append(first, len(pos)))
+    if lengths.max() > _MAX_DIGITS:
+        raise ValueError(f"Integer literal with more than {_MAX_DIGITS} digits.")
+    exponent = np.repeat(first + lengths, lengths) - 1 - np.arange(len(pos))
+    values = np.add.reduceat(digits * _POW10[exponent], first)
+    return pos[first], pos[first + lengths - 1] + 1, values
+
+
+def _negate(b, starts, values):
+    """Applies a '-' sign directly in front of a literal."""
+    negative = (b[np.maximum(starts - 1, 0)] == _MINUS) & (starts > 0)
+    values[negative] *= -1
+    return values
+
+
+def _line_ends(b):
+    """Positions just past the end of every line of the block."""
+    ends = np.flatnonzero(b == _NEWLINE) + 1
+    if len(b) and b[-1] != _NEWLINE:
+        ends = np.append(ends, len(b))
+    return ends
+
+
+def _per_line(positions, ends):
+    """Number of tokens on each line, given the sorted byte positions of the tokens."""
+    return np.diff(np.searchsorted(positions, ends), prepend=0)
+
+
+def _int_rows_block(b, signed=True):
+    starts, _, values = _digit_runs(b)
+    if signed:
+        values = _negate(b, starts, values)
+    lengths = _per_line(starts, _line_ends(b))
+    return values, lengths[lengths > 0]
+
+
+def parse_int_rows(path, signed=True, block_size=BLOCK_SIZE):
+    """
+    Reads every integer on each line, e.g. "1,2,3", "[3, 1, 2]" or "[1, 2][3, 4]".
+
+    Returns:
+    --------
+    tuple: values (np.array), offsets (np.array)
+    """
+    values, lengths = _parse_file(path, lambda b: _int_rows_block(b, signed), block_size)
+    return values, _offsets(lengths)
+
+
+def parse_int_matrix(path, signed=True, block_size=BLOCK_SIZE):
+    """
+    Like parse_int_rows for files where every line holds the same number of integers. Returns an (N, L) array.
+    """
+    values, lengths = _parse_file(path, lambda b: _int_rows_block(b, signed), block_size)
+    return _rows(values, lengths)
+
+
+def parse_mheight(path, block_size=BLOCK_SIZE):
+    """
+    Reads "(0, 1, 1, ...);label" lines of the mHeight files.
+
+    Returns:
+    --------
+    tuple: X (np.array of shape (N, L)), y (np.array of shape (N,))
+    """
+    values, lengths = _parse_file(path, _int_rows_block, block_size)
+    X = _rows(values, lengths)
+    return np.ascontiguousarray(X[:, :-1]), np.ascontiguousarray(X[:, -1])
+
+
+def _digit_rows_block(b):
+    pos = np.flatnonzero((b >= 48) & (b <= 57))
+    lengths = _per_line(pos, _line_ends(b))
+    return (b[pos] - 48).astype(np.int64), lengths[lengths > 0]
+
+
+def parse_lattice_path(path, block_size=BLOCK_SIZE):
+    """
+    Reads the lattice path covers files, where every digit character on a line is one entry.
+    Returns an (N, L) array.
+    """
+    return _rows(*_parse_file(path, _digit_rows_block, block_size))
+
+
+def _quiver_block(b):
+    # load_quiver_data keeps a comma separated field only if it is all digits or starts with '-'.
+    # The last field of a line still carries its newline, so it only survives when it is negative.
+    starts, stops, values = _digit_runs(b)
+    values = _negate(b, starts, values)
+    before = np.where(starts > 0, b[np.maximum(starts - 1, 0)], _NEWLINE)
+    before_sign = np.where(starts > 1, b[np.maximum(starts - 2, 0)], _NEWLINE)
+    after = np.where(stops < len(b), b[np.minimum(stops, len(b) - 1)], _COMMA)
+    field_start = (before == _COMMA) | (before == _NEWLINE)
+    plain = field_start & (after == _COMMA)
+    negative = (before == _MINUS) & ((before_sign == _COMMA) | (before_sign == _NEWLINE))
+    keep = plain | negative
+    lengths = _per_line(starts[keep], _line_ends(b))
+    return values[keep], lengths[lengths > 0]
+
+
+def parse_quiver(path, block_size=BLOCK_SIZE):
+    """
+    Reads a quiver B-matrix csv file with the same field rules as load_quiver_data. Returns an (N, L) array.
+    """
+    return _rows(*_parse_file(path, _quiver_block, block_size))
+
+
+def _kl_block(b):
+    ends = _line_ends(b)
+    commas = np.flatnonzero(b == _COMMA)
+    # Mark the bytes before the second comma of each line: the two permutations written digit by digit
+    line_starts = np.concatenate(([0], ends[:-1]))
+    first_comma = np.searchsorted(commas, line_starts)
+    second_comma = commas[np.minimum(first_comma + 1, len(commas) - 1)] if len(commas) else ends
+    perm_end = np.clip(second_comma, line_starts, ends)
+    bounds = np.column_stack((perm_end - line_starts, ends - perm_end)).ravel()
+    in_perm = np.repeat(np.tile([True, False], len(ends)), bounds)
+    digit = (b >= 48) & (b <= 57)
+    perm_pos = np.flatnonzero(digit & in_perm)
+    starts, _, coeffs = _digit_runs(b, digit & ~in_perm)
+    perm_lengths = _per_line(perm_pos, ends)
+    coeff_lengths = _per_line(starts, ends)
+    keep = (perm_lengths > 0) | (coeff_lengths > 0)
+    return (b[perm_pos] - 48).astype(np.int64), perm_lengths[keep], coeffs, coeff_lengths[keep]
+
+
+def parse_kl_polynomial(path, block_size=BLOCK_SIZE):
+    """
+    Reads "12345, 21345, 1, 2, 1" lines of the KL polynomial files: two permutations written digit by
+    digit followed by the polynomial coefficients.
+
+    Returns:
+    --------
+    tuple: X (np.array of shape (N, 2n)) holding both permutations, coefficient values (np.array), coefficient offsets (np.array)
+    """
+    perms, perm_lengths, coeffs, coeff_lengths = _parse_file(path, _kl_block, block_size)
+    return _rows(perms, perm_lengths), coeffs, _offsets(coeff_lengths)
+
+
+def _rsk_block(b, n):
+    starts, _, values = _digit_runs(b)
+    opening = np.flatnonzero(b == _LBRACKET)
+    closing = np.flatnonzero(b == _RBRACKET)
+    positions = np.concatenate((starts, opening, closing))
+    values = np.concatenate((values, np.zeros(len(opening), dtype=np.int64), np.full(len(closing), n + 1, dtype=np.int64)))
+    order = np.argsort(positions, kind='stable')
+    lengths = _per_line(positions[order], _line_ends(b))
+    return values[order], lengths[lengths > 0]
+
+
+def parse_rsk_tableaux(path, n, block_size=BLOCK_SIZE):
+    """
+    Reads the RSK tableau pair files the way process_rsk does: '[' becomes 0, ']' becomes n+1 and every
+    number is kept in order.
+
+    Returns:
+    --------
+    tuple: values (np.array), offsets (np.array)
+    """
+    values, lengths = _parse_file(path, lambda b: _rsk_block(b, n), block_size)
+    return values, _offsets(lengths)
+
+
+def _lists_block(b, num_lists):
+    starts, _, values = _digit_runs(b)
+    values = _negate(b, starts, values)
+    lengths = _per_line(starts, _line_ends(b))
+    lengths = lengths[lengths > 0]
+    line_first = np.cumsum(lengths) - lengths
+    token_line = np.repeat(np.arange(len(lengths)), lengths)
+    # The last number of a line is the trailing scalar, the others belong to the lists
+    last = np.zeros(len(starts), dtype=bool)
+    last[line_first + lengths - 1] = True
+    # Count the '[' before each number within its line; successive lists differ by one
+    opened = np.searchsorted(np.flatnonzero(b == _LBRACKET), starts)
+    group = opened - opened[line_first][token_line]
+    listed = ~last
+    if np.any(group[listed] >= num_lists):
+        raise ValueError(f"Found more than {num_lists} lists on a line.")
+    counts = np.bincount(token_line[listed] * num_lists + group[listed], minlength=len(lengths) * num_lists)
+    counts = counts.reshape(len(lengths), num_lists)
+    parts = []
+    for k in range(num_lists):
+        parts += [values[listed & (group == k)], counts[:, k]]
+    return (*parts, values[last])
+
+
+def parse_lists_and_scalar(path, num_lists, block_size=BLOCK_SIZE):
+    """
+    Reads lines holding num_lists integer lists followed by one integer, such as "[[1, 2], [2, 1], [1, 2], 0]"
+    (schubert) or "([3, 1, 1], [2, 2, 1], -2)" (symmetric group characters).
+
+    Returns:
+    --------
+    tuple: values and offsets (np.array) of each list in turn, then the scalars (np.array)
+    """
+    parts = _parse_file(path, lambda b: _lists_block(b, num_lists), block_size)
+    result = []
+    for k in range(num_lists):
+        result += [parts[2 * k], _offsets(parts[2 * k + 1])]
+    return (*result, parts[-1])
+
+
+def ragged_to_dense(values, offsets, width=None, fill=0, out=None):
+    """
+    Pads ragged (values, offsets) rows into a (num_rows, width) array in one vectorized pass.
+
+    width defaults to the length of the longest row, or to the number of columns of out. Positions past the
+    end of a row take the value of fill, which is either a scalar or an array with one value per column.
+    out is an optional preallocated array to fill, which may be a slice of a larger one, e.g. the columns
+    that one part of a concatenated input goes to. Returns the padded array.
+    """
+    values = np.asarray(values)
+    offsets = np.asarray(offsets)
+    lengths = np.diff(offsets)
+    if width is None:
+        width = out.shape[1] if out is not None else int(lengths.max(initial=0))
+    if len(lengths) and lengths.max() > width:
+        raise ValueError(f"Row of length {lengths.max()} does not fit in width {width}.")
+    if out is None:
+        out = np.empty((len(lengths), width), dtype=values.dtype)
+    elif out.shape != (len(lengths), width):
+        raise ValueError(f"out has shape {out.shape}, expected {(len(lengths), width)}.")
+    out[...] = fill
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    columns = np.arange(offsets[-1] - offsets[0]) - np.repeat(offsets[:-1] - offsets[0], lengths)
+    out[rows, columns] = values[offsets[0]:offsets[-1]]
+    return out
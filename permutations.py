@@ -0,0 +1,88 @@
+"""
+Batched encoders for permutations given in one-line notation as an (N, n) integer array.
+
+The inversion encoding is the one used for the rsk targets and the mheight inputs: entry k of the
+vector for p is 1 when p[i] > p[j] for the k-th pair i < j, with pairs in row-major upper-triangle
+order (0,1), (0,2), ..., (n-2,n-1). Every encoder has a matching decoder returning one-line
+notation on the letters 1..n.
+"""
+import numpy as np
+
+
+def _as_permutations(perms):
+    perms = np.asarray(perms)
+    if perms.ndim != 2:
+        raise ValueError(f"Expected an (N, n) array of permutations, got shape {perms.shape}.")
+    return perms
+
+
+def inversion_vectors(perms, dtype=np.int64):
+    """
+    Returns the (N, n(n-1)/2) inversion vectors of an (N, n) array of permutations, vectorized over the
+    upper-triangle index pairs.
+    """
+    perms = _as_permutations(perms)
+    i, j = np.triu_indices(perms.shape[1], k=1)
+    return (perms[:, i] > perms[:, j]).astype(dtype)
+
+
+def permutations_from_inversion_vectors(vectors, n=None):
+    """
+    Inverse of inversion_vectors. p[i] is one more than the number of letters smaller than it, which are the
+    j > i with an inversion (i, j) and the j < i without one.
+    """
+    vectors = np.asarray(vectors)
+    if n is None:
+        n = int(round((1 + np.sqrt(1 + 8 * vectors.shape[1])) / 2))
+    if n * (n - 1) // 2 != vectors.shape[1]:
+        raise ValueError(f"Inversion vectors of length {vectors.shape[1]} do not match n={n}.")
+    i, j = np.triu_indices(n, k=1)
+    smaller = np.zeros((len(vectors), n, n), dtype=np.int64)
+    smaller[:, i, j] = vectors
+    smaller[:, j, i] = 1 - vectors
+    return smaller.sum(axis=2) + 1
+
+
+def lehmer_codes(perms, dtype=np.int64):
+    """
+    Returns the (N, n) Lehmer codes of an (N, n) array of permutations: entry i counts the j > i with p[j] < p[i].
+    """
+    perms = _as_permutations(perms)
+    n = perms.shape[1]
+    later = np.triu(np.ones((n, n), dtype=bool), k=1)
+    return ((perms[:, None, :] < perms[:, :, None]) & later).sum(axis=2).astype(dtype)
+
+
+def permutations_from_lehmer_codes(codes):
+    """
+    Inverse of lehmer_codes. Position by position, p[i] is the (code[i]+1)-th smallest letter not used yet.
+    """
+    codes = np.asarray(codes)
+    num_perms, n = codes.shape
+    if np.any((codes < 0) | (codes >= n - np.arange(n))):
+        raise ValueError("Lehmer code entry out of range.")
+    unused = np.ones((num_perms, n), dtype=bool)
+    perms = np.empty((num_perms, n), dtype=np.int64)
+    rows = np.arange(num_perms)
+    for i in range(n):
+        letter = np.argmax(np.cumsum(unused, axis=1) == codes[:, i:i + 1] + 1, axis=1)
+        perms[:, i] = letter + 1
+        unused[rows, letter] = False
+    return perms
+
+
+def one_line_tokens(perms, dtype=np.int64):
+    """
+    Encodes permutations of 1..n in one-line notation as token indices 0..n-1, the input layout for
+    nn.Embedding or OneHotDataModule. Raises ValueError if a row is not a permutation of 1..n.
+    """
+    perms = _as_permutations(perms)
+    n = perms.shape[1]
+    if not np.array_equal(np.sort(perms, axis=1), np.broadcast_to(np.arange(1, n + 1), perms.shape)):
+        raise ValueError(f"Rows are not permutations of 1..{n}.")
+    return (perms - 1).astype(dtype)
+
+
+def permutations_from_one_line_tokens(tokens):
+    """Inverse of one_line_tokens."""
+    return np.asarray(tokens, dtype=np.int64) + 1
@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+import fixtures
+from load_datasets import get_dataset
+
+
+def _cold_load(folder, cache_dir, mmap):
+    dataset = get_dataset("weaving", 6, folder, cache_dir=cache_dir, mmap=mmap, verbose=False)
+    return [np.asarray(array).sum() for array in dataset.as_tuple()[:4]]
+
+
+def test_concurrent_cold_loads_share_one_entry(tmp_path):
+    folder = fixtures.write_fixture("weaving", 6, str(tmp_path / "data"), rows=20000)
+    cache_dir = str(tmp_path / "cache")
+    expected = _cold_load(folder, None, False)
+
+    with ProcessPoolExecutor(max_workers=6, mp_context=get_context("spawn")) as pool:
+        results = list(pool.map(_cold_load, [folder] * 6, [cache_dir] * 6, [True, False] * 3))
+
+    assert all(result == expected for result in results)
+    # One finished entry, and no temporary directories left behind
+    assert len(os.listdir(cache_dir)) == 1
+    assert _cold_load(folder, cache_dir, True) == expected
+
+
+def test_rebuild_replaces_entry(tmp_path):
+    folder = fixtures.write_fixture("weaving", 6, str(tmp_path / "data"), rows=1000)
+    cache_dir = str(tmp_path / "cache")
+    first = get_dataset("weaving", 6, folder, cache_dir=cache_dir, mmap=True, verbose=False)
+    second = get_dataset("weaving", 6, folder, cache_dir=cache_dir, mmap=True, rebuild_cache=True, verbose=False)
+    assert "cache_write" in second.timings
+    # The memmaps of the replaced entry stay readable
+    assert np.array_equal(np.asarray(first.X_train), np.asarray(second.X_train))
+    assert len(os.listdir(cache_dir)) == 1
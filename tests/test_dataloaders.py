@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import torch
+
+import fixtures
+from dataloaders import CombDataModule, MemmapDataset, OneHotDataModule, one_hot_batch
+from load_datasets import PackedBits, get_dataset
+
+
+@pytest.fixture(scope="module")
+def lattice_paths(tmp_path_factory):
+    folder = fixtures.write_fixture("lattice_path", 10, str(tmp_path_factory.mktemp("lattice")), rows=2000)
+    cache_dir = str(tmp_path_factory.mktemp("cache"))
+    mapped = get_dataset("lattice_path", 10, folder, cache_dir=cache_dir, mmap=True, packed=True, verbose=False)
+    loaded = get_dataset("lattice_path", 10, folder, cache_dir=cache_dir, verbose=False)
+    return mapped, loaded
+
+
+def _forbid_full_reads(monkeypatch):
+    """Fails on any read of a whole PackedBits array and records the rows of every indexed read."""
+    reads = []
+    getitem = PackedBits.__getitem__
+
+    def read_rows(self, idx):
+        rows = getitem(self, idx)
+        reads.append(len(rows))
+        return rows
+
+    def full_read(self, *args, **kwargs):
+        raise AssertionError("the full packed array was unpacked")
+
+    monkeypatch.setattr(PackedBits, "__getitem__", read_rows)
+    monkeypatch.setattr(PackedBits, "unpack", full_read)
+    monkeypatch.setattr(PackedBits, "__array__", full_read)
+    return reads
+
+
+def _module(module_class, dataset):
+    args = dataset.as_tuple()[:4]
+    if module_class is OneHotDataModule:
+        args += (int(dataset.num_tokens),)
+    module = module_class(*args, batch_size=64)
+    module.setup()
+    return module
+
+
+@pytest.mark.parametrize("module_class", [CombDataModule, OneHotDataModule])
+def test_packed_memmap_datamodule_reads_batches_only(lattice_paths, monkeypatch, module_class):
+    mapped, loaded = lattice_paths
+    assert isinstance(mapped.X_train, PackedBits) and isinstance(mapped.X_train.packed, np.memmap)
+    reads = _forbid_full_reads(monkeypatch)
+
+    module = _module(module_class, mapped)
+    assert isinstance(module.train_dataset, MemmapDataset)
+    # The datasets still hold the memory-mapped arrays, not copies
+    assert module.train_dataset.X.packed is mapped.X_train.packed
+    assert isinstance(module.train_dataset.y, np.memmap)
+
+    batches = list(module.val_dataloader())
+    assert reads and max(reads) <= 64
+    X = torch.cat([X for X, _ in batches])
+    y = torch.cat([y for _, y in batches])
+    expected_batches = list(_module(module_class, loaded).val_dataloader())
+    assert torch.equal(X, torch.cat([X for X, _ in expected_batches]))
+    assert torch.equal(y, torch.cat([y for _, y in expected_batches]))
+
+    X, y = next(iter(module.train_dataloader()))
+    assert X.shape[0] == y.shape[0] == 64
+
+
+def test_one_hot_batch_matches_one_hot_and_rejects_out_of_range_tokens():
+    X = torch.tensor([[2, 0, 1], [0, 0, 2]])
+    assert torch.equal(one_hot_batch(X, 3), torch.nn.functional.one_hot(X, 3).float().flatten(1))
+    for bad in ([[3, 0, 1]], [[0, -1, 1]]):
+        with pytest.raises(ValueError):
+            one_hot_batch(torch.tensor(bad), 3)
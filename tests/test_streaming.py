@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+import dataloaders
+import fixtures
+import parsers
+from dataloaders import StreamingDataset
+from load_datasets import iter_dataset
+
+
+@pytest.fixture(scope="module")
+def lattice_folder(tmp_path_factory):
+    return fixtures.write_fixture("lattice_path", 10, str(tmp_path_factory.mktemp("lattice")), rows=4000)
+
+
+def _epoch(loader):
+    batches = list(loader)
+    return torch.cat([X for X, _ in batches]), [y for _, y in batches]
+
+
+def _rows(X):
+    return sorted(map(tuple, X.tolist()))
+
+
+def test_line_chunk_ranges_match_iter_line_chunks(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"".join(b"%d,%d\n" % (i, i * i) for i in range(1003)) + b"7,7")
+    chunks = list(parsers.iter_line_chunks(str(path), 10))
+    ranges = parsers.line_chunk_ranges(str(path), 10, block_size=64)
+    assert [parsers.read_range(str(path), start, stop) for start, stop in ranges] == chunks
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_shuffled_stream_mixes_classes_and_epochs(lattice_folder, num_workers):
+    dataset = StreamingDataset("lattice_path", 10, folder=lattice_folder, batch_size=50, chunk_size=50, shuffle=True)
+    loader = DataLoader(dataset, batch_size=None, num_workers=num_workers)
+    first, first_labels = _epoch(loader)
+    second, _ = _epoch(loader)
+
+    plain, plain_labels = _epoch(DataLoader(StreamingDataset("lattice_path", 10, folder=lattice_folder, batch_size=50, chunk_size=50), batch_size=None))
+    # The unshuffled stream reads one file (class) after the other
+    assert all(len(torch.unique(y)) == 1 for y in plain_labels)
+
+    mixed = np.mean([len(torch.unique(y)) > 1 for y in first_labels])
+    assert mixed > 0.75
+    assert _rows(first) == _rows(second) == _rows(plain)
+    assert not torch.equal(first, second)
+
+
+def test_shuffled_stream_is_reproducible(lattice_folder):
+    epochs = [_epoch(DataLoader(StreamingDataset("lattice_path", 10, folder=lattice_folder, batch_size=50, chunk_size=50,
+                                                 shuffle=True, seed=3), batch_size=None))[0] for _ in range(2)]
+    assert torch.equal(*epochs)
+
+
+@pytest.mark.parametrize("chunk_size, batch_size", [(32, 64), (50, 64), (200, 64)])
+def test_shuffle_buffer_stays_bounded(lattice_folder, monkeypatch, chunk_size, batch_size):
+    read = []
+
+    def counting_iter_dataset(*args, **kwargs):
+        for X, y in iter_dataset(*args, **kwargs):
+            read.append(len(X))
+            yield X, y
+
+    monkeypatch.setattr(dataloaders, "iter_dataset", counting_iter_dataset)
+    dataset = StreamingDataset("lattice_path", 10, folder=lattice_folder, batch_size=batch_size, chunk_size=chunk_size,
+                               shuffle=True, buffer_chunks=4)
+    capacity = max(4 * chunk_size, batch_size)
+    served, pooled = 0, []
+    for X, _ in dataset:
+        # Rows read so far but not yet served sit in the shuffle buffer
+        pooled.append(sum(read) - served)
+        served += len(X)
+    assert served == sum(read) == 4000
+    assert max(pooled) < capacity + chunk_size + batch_size
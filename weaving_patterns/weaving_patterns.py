@@ -1,34 +1,712 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+NPY_HEADER_SIZE = 128
+
+
 class WeavingPattern:
     @staticmethod
-    def iterate(n, on_pattern):
+    def iterate(n, on_pattern, num_workers=1, split_depth=None):
         """
         Iterate through weaving patterns.
         
         Args:
             n: Size of the pattern
             on_pattern: Callback function to be called for each valid pattern
+            num_workers: Number of processes; above 1 the enumeration is split as in iterate_parallel
+            split_depth: Depth of the split, see iterate_parallel
+        """
+        m = n-1
+        callback = lambda P: on_pattern([P[i*m:(i+1)*m] for i in range(n)])
+        if num_workers == 1:
+            WeavingPattern.iterate_flat(n, callback)
+        else:
+            WeavingPattern.iterate_parallel(n, callback, num_workers, split_depth)
+
+    @staticmethod
+    def iterate_flat(n, on_pattern):
+        """
+        Iterate through weaving patterns with an explicit stack instead of recursion.
+
+        P is kept in a flat preallocated list (row i is P[i*(n-1):(i+1)*(n-1)]) together with the column of every
+        value in its row, so no row is searched. Braids and unbraids are flat lists in the order moves are tried
+        (z from n-1 down to 0, then iz upwards), and the nonzero entries of each are tracked as bitmasks: the next
+        braid to try and the first nonzero unbraid of the validity check are read off the lowest set bits instead
+        of scanning, and moves that the unbraid mask already rules out are skipped before P is touched. Changes
+        made by a move go to per-depth undo buffers that are reused. Patterns come out in the same order as the
+        recursive enumeration.
+
+        Args:
+            n: Size of the pattern
+            on_pattern: Callback function called with the flat pattern P for each valid pattern. P is modified
+                in place afterwards, so copy it to keep it.
+        """
+        state = WeavingPattern._initial_state(n)
+        on_pattern(state[0])
+        WeavingPattern._walk(n, state, on_pattern)
+
+    @staticmethod
+    def iterate_parallel(n, on_pattern, num_workers=None, split_depth=None):
+        """
+        Like iterate_flat, with the search tree split among processes.
+
+        The tree is expanded serially to split_depth moves. The states at that depth are handed to a pool of
+        num_workers processes (os.cpu_count() by default), each of which returns the patterns of its subtree
+        packed as bytes. on_pattern is called in this process, with the patterns in the same order as the
+        serial enumeration. split_depth defaults to the smallest depth with at least 32 subtrees per worker.
+
+        Args:
+            n: Size of the pattern
+            on_pattern: Callback function called with the flat pattern P for each valid pattern
+            num_workers: Number of worker processes
+            split_depth: Number of moves expanded before the subtrees are handed out
+        """
+        size = n*(n-1)
+        for item in WeavingPattern._parallel_results(n, _subtree_patterns, num_workers, split_depth):
+            for start in range(0, len(item), size):
+                on_pattern(list(item[start:start+size]))
+
+    @staticmethod
+    def count(n, num_workers=1, split_depth=None):
+        """
+        Counts the weaving patterns of size n without building them, in num_workers processes
+        (see iterate_parallel).
+        """
+        if num_workers == 1:
+            return 1 + WeavingPattern._walk(n, WeavingPattern._initial_state(n), None)
+        results = WeavingPattern._parallel_results(n, _subtree_count, num_workers, split_depth)
+        return sum(1 if isinstance(item, bytes) else item for item in results)
+
+    @staticmethod
+    def iterate_batches(n, on_batch, batch_size=65536, num_workers=1, split_depth=None):
+        """
+        Iterate through weaving patterns in batches.
+
+        on_batch is called with a (batch, n, n-1) uint8 array of patterns, in enumeration order. The array is a
+        view of a preallocated buffer that is overwritten by the next batch, so copy it to keep it. With
+        num_workers above 1, the subtrees are enumerated as in iterate_parallel and their packed patterns are
+        copied into the buffer in bulk.
+        """
+        size = n*(n-1)
+        buffer = np.empty(batch_size*size, dtype=np.uint8)
+        filled = 0
+
+        def flush():
+            on_batch(buffer[:filled].reshape(-1, n, n-1))
+
+        if num_workers == 1:
+            def add(P):
+                nonlocal filled
+                buffer[filled:filled+size] = P
+                filled += size
+                if filled == len(buffer):
+                    flush()
+                    filled = 0
+            WeavingPattern.iterate_flat(n, add)
+        else:
+            for item in WeavingPattern._parallel_results(n, _subtree_patterns, num_workers, split_depth):
+                item = np.frombuffer(item, dtype=np.uint8)
+                while len(item):
+                    take = min(len(item), len(buffer)-filled)
+                    buffer[filled:filled+take] = item[:take]
+                    filled += take
+                    item = item[take:]
+                    if filled == len(buffer):
+                        flush()
+                        filled = 0
+        if filled:
+            flush()
+
+    @staticmethod
+    def write(n, path, fmt="text", batch_size=65536, num_workers=1, split_depth=None, canonical=False,
+              checkpoint=None, checkpoint_every=600.0):
+        """
+        Enumerates the weaving patterns of size n into a file and returns how many were written.
+
+        fmt "text" writes the to_string format with a blank line after every pattern. fmt "npy" writes a
+        (count, n, n-1) uint8 .npy file, with 1 subtracted from every entry as in P. fmt "packed" writes a .npy
+        file of (count, ceil(n(n-1)/2)) bytes holding two entries each, see pack and unpack. With canonical=True
+        only one pattern per rotation/reflection orbit is written, and the orbit sizes go to
+        {path}.orbit_sizes.npy.
+
+        The tree is split as in iterate_parallel (also when num_workers is 1). With a checkpoint path, the
+        number of finished subtrees and the file sizes are saved there every checkpoint_every seconds. If the
+        checkpoint file exists, the run resumes from it instead of starting over; it is removed at the end.
+        """
+        if fmt not in ("text", "npy", "packed"):
+            raise ValueError(f'fmt must be "text", "npy" or "packed", not {fmt!r}.')
+        size = n*(n-1)
+        orbit_path = f"{path}.orbit_sizes.npy" if canonical else None
+        settings = {"n": n, "fmt": fmt, "canonical": canonical}
+        progress = None
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                progress = json.load(f)
+            if {key: progress[key] for key in settings} != settings:
+                raise ValueError(f"Checkpoint {checkpoint} was written for {progress}, not {settings}.")
+            split_depth = progress["split_depth"]
+        split_depth, items = WeavingPattern._split(n, split_depth, 32*(num_workers or os.cpu_count()))
+
+        files = [open(path, "r+b" if progress else "wb")]
+        if canonical:
+            files.append(open(orbit_path, "r+b" if progress else "wb"))
+        try:
+            if progress:
+                # Drop whatever was written after the checkpoint
+                for f, offset in zip(files, progress["offsets"]):
+                    f.truncate(offset)
+                    f.seek(offset)
+                total, start = progress["count"], progress["items"]
+            else:
+                if fmt != "text":
+                    files[0].write(WeavingPattern._npy_header((0,) + WeavingPattern._row_shape(n, fmt)))
+                if canonical:
+                    files[1].write(WeavingPattern._npy_header((0,)))
+                total, start = 0, 0
+
+            pending = []
+            pending_size = 0
+            last_checkpoint = time.monotonic()
+
+            def flush():
+                nonlocal total, pending_size
+                batch = np.frombuffer(b"".join(pending), dtype=np.uint8).reshape(-1, n, n-1)
+                if canonical:
+                    forms, sizes = WeavingPattern.canonical(batch)
+                    keep = np.all(forms == batch, axis=(1, 2))
+                    batch = batch[keep]
+                    files[1].write(sizes[keep].astype(np.uint8).tobytes())
+                if len(batch) and fmt == "text":
+                    files[0].write(WeavingPattern.to_text(batch))
+                elif len(batch):
+                    files[0].write((WeavingPattern.pack(batch) if fmt == "packed" else batch).tobytes())
+                total += len(batch)
+                pending.clear()
+                pending_size = 0
+
+            results = WeavingPattern._item_results(n, _subtree_patterns, items, num_workers or os.cpu_count(), start)
+            for done, item in enumerate(results, start+1):
+                pending.append(item)
+                pending_size += len(item)
+                if pending_size >= batch_size*size:
+                    flush()
+                if checkpoint is not None and time.monotonic() - last_checkpoint >= checkpoint_every:
+                    flush()
+                    WeavingPattern._save_checkpoint(checkpoint, dict(settings, split_depth=split_depth, items=done, count=total,
+                                                                     offsets=[f.tell() for f in files]), files)
+                    last_checkpoint = time.monotonic()
+            if pending:
+                flush()
+
+            if fmt != "text":
+                files[0].seek(0)
+                files[0].write(WeavingPattern._npy_header((total,) + WeavingPattern._row_shape(n, fmt)))
+            if canonical:
+                files[1].seek(0)
+                files[1].write(WeavingPattern._npy_header((total,)))
+        finally:
+            for f in files:
+                f.close()
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return total
+
+    @staticmethod
+    def write_dataset(n, folder, negative_ratio=1.0, test_fraction=0.3, seed=0, batch_size=65536, num_workers=1,
+                      split_depth=None):
+        """
+        Builds a train/test split of weaving patterns (label 1) and non-weaving patterns (label 0) in the files
+        read by load_datasets.get_dataset("weaving", n): weaving_pattern_{train,test}_{n}.txt and
+        labels_{train,test}_{n}.txt in folder (get_dataset looks for them in {folder}/weaving_patterns).
+
+        Patterns are streamed from iterate_batches in one pass. For every batch, negative_ratio negatives per
+        pattern are made as in the published datasets: a random pattern of the batch with the entries of each
+        row shuffled, drawn again while it is still a weaving pattern (see is_weaving). The batch is then
+        shuffled and every example goes to the test split with probability test_fraction. Memory stays bounded
+        by batch_size, and the files depend only on seed, not on num_workers. Returns the number of examples
+        written as {"train": ..., "test": ...}.
+        """
+        rng = np.random.default_rng(seed)
+        counts = {"train": 0, "test": 0}
+        seen = 0
+        os.makedirs(folder, exist_ok=True)
+        files = {(kind, split): open(os.path.join(folder, f"{kind}_{split}_{n}.txt"), "wb")
+                 for kind in ("weaving_pattern", "labels") for split in counts}
+
+        def add(batch):
+            nonlocal seen
+            # Keep the overall ratio exact, whatever the batch sizes
+            num_negatives = int((seen+len(batch)) * negative_ratio) - int(seen * negative_ratio)
+            seen += len(batch)
+            negatives = WeavingPattern.shuffle_rows(batch[rng.integers(0, len(batch), num_negatives)], rng)
+            redraw = np.flatnonzero(WeavingPattern.is_weaving(negatives))
+            while len(redraw):
+                negatives[redraw] = WeavingPattern.shuffle_rows(negatives[redraw], rng)
+                redraw = redraw[WeavingPattern.is_weaving(negatives[redraw])]
+
+            patterns = np.concatenate((batch, negatives))
+            labels = np.repeat(np.array([1, 0], dtype=np.uint8), (len(batch), num_negatives))
+            order = rng.permutation(len(patterns))
+            test = rng.random(len(patterns)) < test_fraction
+            for split, mask in (("train", ~test), ("test", test)):
+                chosen = order[mask]
+                if len(chosen):
+                    files["weaving_pattern", split].write(WeavingPattern.to_lines(patterns[chosen]))
+                    files["labels", split].write((np.stack((labels[chosen] + ord("0"), np.full(len(chosen), ord("\n"))), axis=1)
+                                                  .astype(np.uint8).tobytes()))
+                    counts[split] += len(chosen)
+
+        try:
+            WeavingPattern.iterate_batches(n, add, batch_size, num_workers, split_depth)
+        finally:
+            for f in files.values():
+                f.close()
+        return counts
+
+    @staticmethod
+    def shuffle_rows(patterns, rng):
+        """Returns a copy of a (batch, n, n-1) array of patterns with the entries of every row randomly permuted."""
+        order = rng.random(patterns.shape).argsort(axis=2)
+        return np.take_along_axis(patterns, order, axis=2)
+
+    @staticmethod
+    def is_weaving(patterns):
+        """
+        Tells which patterns of a (batch, n, n-1) array (entries 0 to n-1, as in P) are weaving patterns.
+
+        Row i of a weaving pattern lists the lines that line i of a pseudoline arrangement crosses, in order. The
+        check sweeps the arrangement for the whole batch at once: starting from lines 0, ..., n-1 in order, two
+        neighbouring lines that are each other's next crossing are swapped, and a pattern is valid when every
+        line gets through its whole row. Such swaps never overlap, so each round makes all of them together.
+        """
+        patterns = np.asarray(patterns)
+        batch, n, m = patterns.shape
+        rows = np.arange(batch)[:, None]
+        # -1 past the end of a row marks a line that has made all its crossings
+        crossings = np.concatenate((patterns.astype(np.intp), np.full((batch, n, 1), -1)), axis=2)
+        order = np.tile(np.arange(n), (batch, 1))
+        done = np.zeros((batch, n), dtype=np.intp)
+        for _ in range(n*m // 2):
+            upper, lower = order[:, :-1], order[:, 1:]
+            swap = (crossings[rows, upper, done[rows, upper]] == lower) & (crossings[rows, lower, done[rows, lower]] == upper)
+            if not swap.any():
+                break
+            b, i = np.nonzero(swap)
+            order[b, i], order[b, i+1] = order[b, i+1], order[b, i]
+            done[b, order[b, i]] += 1
+            done[b, order[b, i+1]] += 1
+        return np.all(done == m, axis=1)
+
+    @staticmethod
+    def _save_checkpoint(checkpoint, progress, files):
+        for f in files:
+            f.flush()
+            os.fsync(f.fileno())
+        tmp = f"{checkpoint}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp, checkpoint)
+
+    @staticmethod
+    def _row_shape(n, fmt):
+        return (n, n-1) if fmt == "npy" else ((n*(n-1)+1) // 2,)
+
+    @staticmethod
+    def pack(patterns):
+        """
+        Packs a (batch, n, n-1) array of patterns into (batch, ceil(n(n-1)/2)) bytes, two 4-bit entries per
+        byte with the first entry in the high half. Needs n <= 16.
+        """
+        patterns = np.asarray(patterns, dtype=np.uint8)
+        flat = patterns.reshape(len(patterns), -1)
+        if flat.shape[1] % 2:
+            flat = np.concatenate((flat, np.zeros((len(flat), 1), dtype=np.uint8)), axis=1)
+        return (flat[:, 0::2] << 4) | flat[:, 1::2]
+
+    @staticmethod
+    def unpack(packed, n):
+        """Inverse of pack: returns the (batch, n, n-1) array of patterns."""
+        packed = np.asarray(packed, dtype=np.uint8)
+        flat = np.stack((packed >> 4, packed & 0xf), axis=2).reshape(len(packed), -1)
+        return flat[:, :n*(n-1)].reshape(len(packed), n, n-1)
+
+    @staticmethod
+    def symmetries(n):
+        """
+        Returns the dihedral group generated by rotate and reflect (rotate has order 2n, so there are 4n elements)
+        as a pair of arrays: index (4n, n*(n-1)) and values (4n, n). Element g maps a flat pattern P to
+        values[g][P[index[g]]]. The identity comes first.
+        """
+        m = n-1
+        flat = np.arange(n*m).reshape(n, m)
+        # rotate: ret[i] = P[i+1]-1 (mod n) for i < n-1, ret[n-1] = reversed P[0] minus 1
+        rotate = (np.concatenate((flat[1:].ravel(), flat[0, ::-1])), (np.arange(n)-1) % n)
+        # reflect: ret[i] = (n-1) - P[n-1-i]
+        reflect = (flat[::-1].ravel(), (n-1) - np.arange(n))
+        elements = [(np.arange(n*m), np.arange(n))]
+        for index, values in elements[:1] * (2*n - 1):
+            last_index, last_values = elements[-1]
+            elements.append((last_index[rotate[0]], rotate[1][last_values]))
+        elements += [(index[reflect[0]], reflect[1][values]) for index, values in elements]
+        return np.array([e[0] for e in elements]), np.array([e[1] for e in elements])
+
+    @staticmethod
+    def canonical(patterns):
+        """
+        Returns the canonical form of each pattern of a (batch, n, n-1) array, the lexicographically smallest
+        pattern of its rotation/reflection orbit, together with the orbit sizes. Patterns from the datasets are
+        stored 1-based, so subtract 1 first.
+        """
+        patterns = np.asarray(patterns)
+        batch, n, m = patterns.shape
+        flat = patterns.reshape(batch, n*m).astype(np.uint8)
+        index, values = WeavingPattern.symmetries(n)
+        values = values.astype(np.uint8) + 1
+
+        # Rows of nonzero bytes viewed as fixed-width byte strings compare lexicographically
+        def keys(rows):
+            return np.ascontiguousarray(rows).view(f"S{n*m}").ravel()
+
+        own = keys(flat + 1)
+        best = own.copy()
+        fixed = np.zeros(batch, dtype=np.int64)
+        for g in range(len(index)):
+            image = keys(values[g][flat[:, index[g]]])
+            best = np.where(image < best, image, best)
+            fixed += image == own
+        forms = best.view(np.uint8).reshape(batch, n, m) - 1
+        return forms.astype(patterns.dtype), len(index) // fixed
+
+    @staticmethod
+    def orbit(P):
+        """
+        Yields the distinct patterns of the rotation/reflection orbit of P (nested lists, as given to the
+        iterate callback), starting with P itself. Use it to expand the output of iterate_canonical_batches.
+        """
+        seen = set()
+        for Q in WeavingPattern._images(P):
+            key = tuple(map(tuple, Q))
+            if key not in seen:
+                seen.add(key)
+                yield Q
+
+    @staticmethod
+    def _images(P):
+        Q = P
+        rotations = []
+        for _ in range(2*len(P)):
+            rotations.append(Q)
+            Q = WeavingPattern.rotate(Q)
+        yield from rotations
+        for Q in rotations:
+            yield WeavingPattern.reflect(Q)
+
+    @staticmethod
+    def iterate_canonical_batches(n, on_batch, batch_size=65536, num_workers=1, split_depth=None):
+        """
+        Like iterate_batches, but keeps one pattern per rotation/reflection orbit: on_batch is called with the
+        canonical patterns (see canonical) and their orbit sizes. Batches can be shorter than batch_size.
+        """
+        def keep_canonical(batch):
+            forms, sizes = WeavingPattern.canonical(batch)
+            keep = np.all(forms == batch, axis=(1, 2))
+            if keep.any():
+                on_batch(batch[keep], sizes[keep])
+
+        WeavingPattern.iterate_batches(n, keep_canonical, batch_size, num_workers, split_depth)
+
+    @staticmethod
+    def _npy_header(shape):
+        """A .npy header for a uint8 array, padded to NPY_HEADER_SIZE so it can be rewritten in place."""
+        header = repr({'descr': '|u1', 'fortran_order': False, 'shape': shape}).encode()
+        prefix = b"\x93NUMPY\x01\x00"
+        length = NPY_HEADER_SIZE - len(prefix) - 2
+        return prefix + length.to_bytes(2, "little") + header.ljust(length-1) + b"\n"
+
+    @staticmethod
+    def _parallel_results(n, worker, num_workers=None, split_depth=None):
+        """
+        Yields the patterns above the split depth as bytes and worker(n, state) for every subtree below it,
+        in serial enumeration order (see iterate_parallel).
+        """
+        num_workers = num_workers or os.cpu_count()
+        _, items = WeavingPattern._split(n, split_depth, 32*num_workers)
+        yield from WeavingPattern._item_results(n, worker, items, num_workers)
+
+    @staticmethod
+    def _item_results(n, worker, items, num_workers, start=0):
+        """
+        Yields the items of a _split list from position start on, with every state replaced by worker(n, state).
+        The states are handed to a pool when num_workers is above 1.
+        """
+        items = items[start:]
+        if num_workers == 1:
+            for item in items:
+                yield worker(n, item) if isinstance(item, tuple) else item
+            return
+        tasks = (item for item in items if isinstance(item, tuple))
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            # Keep a bounded window of subtrees in flight and consume their results in order
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(worker, n, task))
+                if len(pending) >= 4*num_workers:
+                    break
+            for item in items:
+                if isinstance(item, tuple):
+                    item = pending.popleft().result()
+                    task = next(tasks, None)
+                    if task is not None:
+                        pending.append(pool.submit(worker, n, task))
+                yield item
+
+    @staticmethod
+    def _split(n, split_depth=None, min_tasks=1):
         """
-        # Initialize pattern P
-        P = []
+        Expands the search tree to split_depth moves. Returns the depth used, and a list of the patterns above
+        that depth as bytes and the states at that depth as tuples, in serial enumeration order. Without
+        split_depth, the smallest depth that gives min_tasks states is used.
+        """
+        for depth in ([split_depth] if split_depth else range(1, n*n)):
+            items = []
+            state = WeavingPattern._initial_state(n)
+            items.append(bytes(state[0]))
+            WeavingPattern._walk(n, state, lambda P: items.append(bytes(P)), depth, items.append)
+            num_tasks = sum(isinstance(item, tuple) for item in items)
+            if split_depth or num_tasks >= min_tasks or num_tasks == 0:
+                return depth, items
+        return depth, items
+
+    @staticmethod
+    def _initial_state(n):
+        """
+        Returns the search state (P, pos, braids, unbraids, braid_mask, unbraid_mask) of the first pattern.
+        """
+        m = n-1
+        r = n-2
+
+        # Initialize pattern P, and pos[a*n+v] = column of the value v in row a of P
+        P = [0] * (n*m)
+        pos = [0] * (n*n)
         for i in range(n):
-            P.append([0] * (n-1))
             for j in range(n):
-                if j < i:
-                    P[i][j] = j
-                elif j > i:
-                    P[i][j-1] = j
-        
-        # Initialize braids and unbraids
-        braids = []
-        unbraids = []
-        for i in range(n):
-            braids.append([0] * (n-2))
-            unbraids.append([0] * (n-2))
-            if i >= 2:
-                braids[i][i-2] = ((i-2) << 12) | ((i-2) << 8) | ((i-1) << 4) | (i-2)
-        
-        WeavingPattern._iterate(P, braids, unbraids, on_pattern)
-    
+                if j != i:
+                    ij = j if j < i else j-1
+                    P[i*m+ij] = j
+                    pos[i*n+j] = ij
+
+        # braids[(m-z)*r+iz] holds the braid of row z, column iz; bit k of a mask is set when entry k is nonzero
+        braids = [0] * (n*r)
+        unbraids = [0] * (n*r)
+        braid_mask = 0
+        unbraid_mask = 0
+        for i in range(2, n):
+            q = (m-i)*r+i-2
+            braids[q] = ((i-2) << 12) | ((i-2) << 8) | ((i-1) << 4) | (i-2)
+            braid_mask |= 1 << q
+        return P, pos, braids, unbraids, braid_mask, unbraid_mask
+
+    @staticmethod
+    def _walk(n, state, on_pattern, max_depth=None, on_frontier=None):
+        """
+        Enumerates the patterns below a search state, without the pattern of the state itself, and returns
+        how many there were. on_pattern may be None to only count them.
+
+        With max_depth, the patterns max_depth moves below the state are passed to on_pattern but not expanded;
+        instead on_frontier is called with a copy of their state, in the order they would have been expanded.
+        The lists in state are modified during the walk and restored at the end.
+        """
+        m = n-1
+        r = n-2
+        P, pos, braids, unbraids, braid_mask, unbraid_mask = state
+
+        # Per-depth state: next entry to try, the move made, undo entries and the masks before the move
+        count = 0
+        cursor = [0]
+        moves = [None]
+        braid_undo = [[]]
+        unbraid_undo = [[]]
+        masks = [None]
+
+        depth = 0
+        while True:
+            rest = braid_mask >> cursor[depth]
+            if not rest:
+                depth -= 1
+                if depth < 0:
+                    return count
+                q, braid, x, ix, y, iy, z, iz = moves[depth]
+                bundo = braid_undo[depth]
+                uundo = unbraid_undo[depth]
+            else:
+                q = cursor[depth] + (rest & -rest).bit_length() - 1
+                cursor[depth] = q+1
+                # Below q, the move clears at most the unbraid at q-1 and one more (xya), so two other
+                # nonzero unbraids there already make it invalid
+                low = unbraid_mask & ((1 << q) - 1) & ~((1 << q) >> 1)
+                if low & (low - 1):
+                    continue
+                z = m - q // r
+                iz = q % r
+                braid = braids[q]
+                x = (braid >> 12) & 0xf
+                ix = (braid >> 8) & 0xf
+                y = (braid >> 4) & 0xf
+                iy = (braid >> 0) & 0xf
+                xm, ym, zm = x*m, y*m, z*m
+                if low:
+                    # Valid only if the xya unbraid clear below hits that one bit. The entries it reads
+                    # are not moved by the swaps, except for the column of y when a == z.
+                    if not (0 < ix and 0 < iy):
+                        continue
+                    a = P[xm+ix-1]
+                    if a != P[ym+iy-1] or a <= y:
+                        continue
+                    ia = pos[a*n+y]
+                    if a == z and iz <= ia <= iz+1:
+                        ia = 2*iz+1-ia
+                    if ia >= r or 1 << ((m-a)*r+ia) != low:
+                        continue
+
+                # Swap adjacent elements of P and keep pos in step
+                u, v = P[xm+ix], P[xm+ix+1]
+                P[xm+ix], P[xm+ix+1] = v, u
+                pos[x*n+u], pos[x*n+v] = ix+1, ix
+                u, v = P[ym+iy], P[ym+iy+1]
+                P[ym+iy], P[ym+iy+1] = v, u
+                pos[y*n+u], pos[y*n+v] = iy+1, iy
+                u, v = P[zm+iz], P[zm+iz+1]
+                P[zm+iz], P[zm+iz+1] = v, u
+                pos[z*n+u], pos[z*n+v] = iz+1, iz
+
+                # Compute new braids. Undo entries are (index, value restored), replayed in order.
+                masks[depth] = (braid_mask, unbraid_mask)
+                bundo = braid_undo[depth]
+                uundo = unbraid_undo[depth]
+                bundo.clear()
+                uundo.clear()
+                braids[q] = 0
+                braid_mask &= ~(1 << q)
+
+                # xaz
+                if iz+2 < m and 0 < ix and P[xm+ix-1] == P[zm+iz+2] and x < P[xm+ix-1] < z:
+                    a = P[xm+ix-1]
+                    braids[q+1] = (x << 12) | ((ix-1) << 8) | (a << 4) | pos[a*n+x]
+                    braid_mask |= 1 << (q+1)
+                    bundo.append((q+1, 0))
+
+                # ayz
+                if 0 < iz and 0 < iy and P[zm+iz-1] == P[ym+iy-1] and P[ym+iy-1] < y:
+                    a = P[zm+iz-1]
+                    braids[q-1] = (a << 12) | (pos[a*n+y] << 8) | (y << 4) | (iy-1)
+                    braid_mask |= 1 << (q-1)
+                    bundo.append((q-1, 0))
+
+                # xya
+                if ix+2 < m and iy+1 < r and P[xm+ix+2] == P[ym+iy+2] and P[xm+ix+2] > y:
+                    a = P[xm+ix+2]
+                    k = (m-a)*r+pos[a*n+x]
+                    braids[k] = (x << 12) | ((ix+1) << 8) | (y << 4) | (iy+1)
+                    braid_mask |= 1 << k
+                    bundo.append((k, 0))
+
+                # set axy = 0
+                if 0 < iy:
+                    k = (m-y)*r+iy-1
+                    bundo.append((k, braids[k]))
+                    braids[k] = 0
+                    braid_mask &= ~(1 << k)
+
+                # set yza = 0
+                if iy+2 < m:
+                    a = P[ym+iy+2]
+                    ia = pos[a*n+y]
+                    if ia < r:
+                        k = (m-a)*r+ia
+                        bundo.append((k, braids[k]))
+                        braids[k] = 0
+                        braid_mask &= ~(1 << k)
+
+                # New unbraids
+                unbraids[q] = 1
+                unbraid_mask |= 1 << q
+
+                # unbraid xya = 0
+                if 0 < ix and 0 < iy and P[xm+ix-1] == P[ym+iy-1] and P[xm+ix-1] > y:
+                    a = P[xm+ix-1]
+                    ia = pos[a*n+y]
+                    if ia < r:
+                        k = (m-a)*r+ia
+                        uundo.append((k, unbraids[k]))
+                        unbraids[k] = 0
+                        unbraid_mask &= ~(1 << k)
+
+                # unbraid xaz = 0
+                if 0 < iz and ix+2 < m and P[zm+iz-1] == P[xm+ix+2] and P[zm+iz-1] > x:
+                    uundo.append((q-1, unbraids[q-1]))
+                    unbraids[q-1] = 0
+                    unbraid_mask &= ~(1 << (q-1))
+
+                # unbraid ayz = 0
+                if iz+2 < m and iy+2 < m and P[zm+iz+2] == P[ym+iy+2] and P[zm+iz+2] < y:
+                    uundo.append((q+1, unbraids[q+1]))
+                    unbraids[q+1] = 0
+                    unbraid_mask &= ~(1 << (q+1))
+
+                # unbraid axy = 1
+                if ix+2 < m and iy+2 < m and P[xm+ix+2] == P[ym+iy+2] and P[xm+ix+2] < x:
+                    k = (m-y)*r+iy+1
+                    uundo.append((k, unbraids[k]))
+                    unbraids[k] = 1
+                    unbraid_mask |= 1 << k
+
+                # unbraid yza = 1
+                if 0 < iy and 0 < iz and P[ym+iy-1] == P[zm+iz-1] and P[ym+iy-1] > z:
+                    a = P[ym+iy-1]
+                    k = (m-a)*r+pos[a*n+z]
+                    uundo.append((k, unbraids[k]))
+                    unbraids[k] = 1
+                    unbraid_mask |= 1 << k
+
+                # Valid when the first nonzero unbraid is the one just set
+                if unbraid_mask & -unbraid_mask == 1 << q:
+                    count += 1
+                    if on_pattern is not None:
+                        on_pattern(P)
+                    moves[depth] = (q, braid, x, ix, y, iy, z, iz)
+                    if depth+1 == max_depth:
+                        on_frontier((P[:], pos[:], braids[:], unbraids[:], braid_mask, unbraid_mask))
+                    else:
+                        depth += 1
+                        if depth == len(cursor):
+                            cursor.append(0)
+                            moves.append(None)
+                            braid_undo.append([])
+                            unbraid_undo.append([])
+                            masks.append(None)
+                        cursor[depth] = 0
+                        continue
+
+            # Reset the move at this depth
+            for k, value in bundo:
+                braids[k] = value
+            for k, value in uundo:
+                unbraids[k] = value
+            unbraids[q] = 0
+            braids[q] = braid
+            braid_mask, unbraid_mask = masks[depth]
+            for row, col in ((x, ix), (y, iy), (z, iz)):
+                rm = row*m
+                u, v = P[rm+col], P[rm+col+1]
+                P[rm+col], P[rm+col+1] = v, u
+                pos[row*n+u], pos[row*n+v] = col+1, col
+
     @staticmethod
     def rotate(P):
         """
@@ -73,154 +751,54 @@ class WeavingPattern:
         return ret
     
     @staticmethod
-    def _iterate(P, braids, unbraids, on_pattern):
+    def to_text(patterns):
         """
-        Internal recursion function for iterating through patterns.
-        
-        Args:
-            P: Current weaving pattern
-            braids: Braid encodings
-            unbraids: Unbraid encodings
-            on_pattern: Callback function for each valid pattern
+        Formats a (batch, n, n-1) array of patterns as to_string does, each followed by a blank line, and returns
+        the bytes. The whole batch is laid out at once in fixed-width fields, and the padding is dropped at the end.
         """
-        on_pattern(P)
-        
-        n = len(P)
-        
-        for z in range(n-1, -1, -1):
-            for iz in range(n-2):
-                braid = braids[z][iz]
-                if braid == 0:
-                    continue
-                
-                x = (braid >> 12) & 0xf
-                ix = (braid >> 8) & 0xf
-                y = (braid >> 4) & 0xf
-                iy = (braid >> 0) & 0xf
-                
-                # Modify P in-place - swap adjacent elements (XOR swap)
-                P[x][ix], P[x][ix+1] = P[x][ix+1], P[x][ix]
-                P[y][iy], P[y][iy+1] = P[y][iy+1], P[y][iy]
-                P[z][iz], P[z][iz+1] = P[z][iz+1], P[z][iz]
-                
-                # Compute new braids
-                braids[z][iz] = 0
-                to_reset = [-1, -1, -1, -1, -1]
-                
-                # xaz
-                if iz+2 < n-1 and 0 < ix and P[x][ix-1] == P[z][iz+2] and P[x][ix-1] < z and P[x][ix-1] > x:
-                    a = P[x][ix-1]
-                    ia = 0
-                    while P[a][ia] != x:
-                        ia += 1
-                    braids[z][iz+1] = (x << 12) | ((ix-1) << 8) | (a << 4) | (ia << 0)
-                    to_reset[0] = (z << 4) | (iz+1)
-                
-                # ayz
-                if 0 < iz and 0 < iy and P[z][iz-1] == P[y][iy-1] and P[y][iy-1] < y:
-                    a = P[z][iz-1]
-                    ia = 0
-                    while P[a][ia] != y:
-                        ia += 1
-                    braids[z][iz-1] = (a << 12) | (ia << 8) | (y << 4) | ((iy-1) << 0)
-                    to_reset[1] = (z << 4) | (iz-1)
-                
-                # xya
-                if ix+2 < n-1 and iy+1 < n-2 and P[x][ix+2] == P[y][iy+2] and P[x][ix+2] > y:
-                    a = P[x][ix+2]
-                    ia = 0
-                    while P[a][ia] != x:
-                        ia += 1
-                    braids[a][ia] = (x << 12) | ((ix+1) << 8) | (y << 4) | ((iy+1) << 0)
-                    to_reset[2] = (a << 4) | (ia)
-                
-                # set axy = 0
-                if 0 < iy:
-                    a = P[y][iy-1]
-                    to_reset[3] = (braids[y][iy-1] << 8) | (y << 4) | (iy-1)
-                    braids[y][iy-1] = 0
-                
-                # set yza = 0
-                if iy+2 < n-1:
-                    a = P[y][iy+2]
-                    ia = 0
-                    while P[a][ia] != y:
-                        ia += 1
-                    if ia < n-2:
-                        to_reset[4] = (braids[a][ia] << 8) | (a << 4) | (ia)
-                        braids[a][ia] = 0
-                
-                # New unbraids
-                unbraids_to_reset = [-1, -1, -1, -1, -1]
-                unbraids[z][iz] = 1
-                
-                # unbraid xya = 0
-                if 0 < ix and 0 < iy and P[x][ix-1] == P[y][iy-1] and P[x][ix-1] > y:
-                    a = P[x][ix-1]
-                    ia = 0
-                    while P[a][ia] != y:
-                        ia += 1
-                    if ia < n-2:
-                        unbraids_to_reset[0] = (unbraids[a][ia] << 8) | (a << 4) | (ia)
-                        unbraids[a][ia] = 0
-                
-                # unbraid xaz = 0
-                if 0 < iz and ix+2 < n-1 and P[z][iz-1] == P[x][ix+2] and P[z][iz-1] > x:
-                    unbraids_to_reset[1] = (unbraids[z][iz-1] << 8) | (z << 4) | (iz-1)
-                    unbraids[z][iz-1] = 0
-                
-                # unbraid ayz = 0
-                if iz+2 < n-1 and iy+2 < n-1 and P[z][iz+2] == P[y][iy+2] and P[z][iz+2] < y:
-                    unbraids_to_reset[2] = (unbraids[z][iz+1] << 8) | (z << 4) | (iz+1)
-                    unbraids[z][iz+1] = 0
-                
-                # unbraid axy = 1
-                if ix+2 < n-1 and iy+2 < n-1 and P[x][ix+2] == P[y][iy+2] and P[x][ix+2] < x:
-                    unbraids_to_reset[3] = (unbraids[y][iy+1] << 8) | (y << 4) | (iy+1)
-                    unbraids[y][iy+1] = 1
-                
-                # unbraid yza = 1
-                if 0 < iy and 0 < iz and P[y][iy-1] == P[z][iz-1] and P[y][iy-1] > z:
-                    a = P[y][iy-1]
-                    ia = 0
-                    while P[a][ia] != z:
-                        ia += 1
-                    unbraids_to_reset[4] = (unbraids[a][ia] << 8) | (a << 4) | (ia)
-                    unbraids[a][ia] = 1
-                
-                # Check validity
-                valid = True
-                done = False
-                for w in range(n-1, -1, -1):
-                    for iw in range(n-2):
-                        if unbraids[w][iw] != 0:
-                            if w == z and iw == iz:
-                                done = True
-                            else:
-                                valid = False
-                        if not valid or done:
-                            break
-                    if not valid or done:
-                        break
-                
-                if valid:
-                    WeavingPattern._iterate(P, braids, unbraids, on_pattern)
-                
-                # Reset
-                for i in range(5):
-                    if to_reset[i] != -1:
-                        braids[(to_reset[i] >> 4) & 0xf][to_reset[i] & 0xf] = to_reset[i] >> 8
-                    if unbraids_to_reset[i] != -1:
-                        unbraids[(unbraids_to_reset[i] >> 4) & 0xf][unbraids_to_reset[i] & 0xf] = unbraids_to_reset[i] >> 8
-                
-                unbraids[z][iz] = 0
-                braids[z][iz] = braid
-                
-                # Restore P - swap back
-                P[x][ix], P[x][ix+1] = P[x][ix+1], P[x][ix]
-                P[y][iy], P[y][iy+1] = P[y][iy+1], P[y][iy]
-                P[z][iz], P[z][iz+1] = P[z][iz+1], P[z][iz]
-    
+        patterns = np.asarray(patterns)
+        batch, n, m = patterns.shape
+        # Every number takes 2 bytes and every separator 1; unused bytes stay 0 and are removed
+        numbers = WeavingPattern._number_bytes(n)
+        rows = np.arange(n-1, -1, -1)
+        width = 3 + 3*m + 1
+        out = np.zeros((batch, n, width), dtype=np.uint8)
+        out[:, :, 0:2] = numbers[rows+1]
+        out[:, :, 2] = ord("|")
+        cells = out[:, :, 3:3+3*m].reshape(batch, n, m, 3)
+        cells[..., 0:2] = numbers[patterns[:, rows, :].astype(np.intp)+1]
+        cells[..., 2] = ord(",")
+        out[:, :-1, -1] = ord("\n")
+        tail = np.full((batch, 2), ord("\n"), dtype=np.uint8)
+        out = np.concatenate((out.reshape(batch, -1), tail), axis=1).ravel()
+        return out[out != 0].tobytes()
+
+    @staticmethod
+    def to_lines(patterns):
+        """
+        Formats a (batch, n, n-1) array of patterns in the dataset layout read by load_datasets.get_dataset: one
+        pattern per line, the rows in to_string order written one after the other as comma separated entries
+        from 1 to n. Returns the bytes.
+        """
+        patterns = np.asarray(patterns)
+        batch, n, m = patterns.shape
+        numbers = WeavingPattern._number_bytes(n)
+        out = np.zeros((batch, n*m, 3), dtype=np.uint8)
+        out[:, :, 0:2] = numbers[patterns[:, ::-1, :].reshape(batch, -1).astype(np.intp)+1]
+        out[:, :-1, 2] = ord(",")
+        out[:, -1, 2] = ord("\n")
+        out = out.ravel()
+        return out[out != 0].tobytes()
+
+    @staticmethod
+    def _number_bytes(n):
+        """Returns an (n+1, 2) uint8 array whose row v is the ASCII digits of v, right aligned and padded with 0."""
+        numbers = np.zeros((n+1, 2), dtype=np.uint8)
+        for v in range(1, n+1):
+            digits = str(v).encode()
+            numbers[v, 2-len(digits):] = list(digits)
+        return numbers
+
     @staticmethod
     def to_string(P):
         """
@@ -242,6 +820,47 @@ class WeavingPattern:
                 ret += "\n"
         return ret
 
-N = 7
-with open(f"weaving_patterns_{N}.txt", "w") as f:
-    WeavingPattern.iterate(N, lambda P: f.writelines(WeavingPattern.to_string(P)+"\n\n"))
\ No newline at end of file
+def _subtree_patterns(n, state):
+    """Worker for iterate_parallel: the patterns below a search state, packed as bytes."""
+    out = bytearray()
+    WeavingPattern._walk(n, state, out.extend)
+    return bytes(out)
+
+
+def _subtree_count(n, state):
+    """Worker for WeavingPattern.count: the number of patterns below a search state."""
+    return WeavingPattern._walk(n, state, None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enumerate the weaving patterns of size n into a file.")
+    parser.add_argument("n", type=int, nargs="?", default=7, help="size of the patterns")
+    parser.add_argument("--format", choices=("text", "npy", "packed"), default="text", help="output format, see WeavingPattern.write")
+    parser.add_argument("--output", default=None, help="output file (default weaving_patterns_{n}.txt or .npy)")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--split-depth", type=int, default=None, help="depth at which the search tree is split into subtrees")
+    parser.add_argument("--canonical", action="store_true", help="write one pattern per rotation/reflection orbit")
+    parser.add_argument("--checkpoint", default=None, help="progress file; an existing one is resumed")
+    parser.add_argument("--checkpoint-every", type=float, default=600.0, help="seconds between checkpoints")
+    parser.add_argument("--dataset", action="store_true",
+                        help="write a labeled train/test split for get_dataset into the --output folder instead, see WeavingPattern.write_dataset")
+    parser.add_argument("--negatives", type=float, default=1.0, help="non-weaving patterns per weaving pattern (--dataset)")
+    parser.add_argument("--test-fraction", type=float, default=0.3, help="fraction of examples in the test split (--dataset)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (--dataset)")
+    args = parser.parse_args(argv)
+
+    if args.dataset:
+        output = args.output or "."
+        counts = WeavingPattern.write_dataset(args.n, output, args.negatives, args.test_fraction, args.seed,
+                                              num_workers=args.workers, split_depth=args.split_depth)
+        print(f"Wrote {counts['train']} train and {counts['test']} test examples to {output}")
+        return
+
+    output = args.output or f"weaving_patterns_{args.n}.{'txt' if args.format == 'text' else 'npy'}"
+    count = WeavingPattern.write(args.n, output, args.format, num_workers=args.workers, split_depth=args.split_depth,
+                                 canonical=args.canonical, checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every)
+    print(f"Wrote {count} patterns to {output}")
+
+
+if __name__ == "__main__":
+    main()